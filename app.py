@@ -1,33 +1,57 @@
 #This system was created by Deliena Tasha Binti Abdul Rahim xdeliena on GitHub
 
-import os, sys, shutil, zipfile, uuid, re
+import os, sys, shutil, uuid, re
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 import gradio as gr
 import pandas as pd
-from docx import Document
-import os, tempfile, zipfile
-from docx.shared import Inches 
 from huggingface_hub import HfApi
 import getpass, requests
 from supabase import create_client, Client
-from transformers import pipeline
+from letters import (
+    compile_template, detect_delimiter, iter_records, letter_filename, letter_jobs, parse_table, merge_letters, normalize_column, render_letter,
+    run_jobs, viva_jobs,
+)
+from archive import ARCHIVE_MODES, attach, package
+from pdf import get_pdf_pool
+from preflight import check_letters, check_viva
+from workspace import REAP_INTERVAL, WORKSPACE_TTL, Workspace
+from rowstore import Dataset, RowIndex
+from uploads import Uploader
+from helpindex import build_help_index, check_answers
+from templatestore import TemplateStore
+from profiling import PROFILE_BATCHES, profile_batch
+from preview import PREVIEW_CSS, render_html
 
 # -------------------------
 # Config
 # -------------------------
 SUPABASE_URL = os.getenv("SUPABASE_URL","XXXXXX")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY", "XXX") or os.getenv("SUPABASE_KEY","XXX")
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise RuntimeError("SUPABASE_URL and a SUPABASE key must be set in env vars")
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+LOCAL_STORAGE_DIR = os.getenv("LETTER_LOCAL_STORAGE")  # folder-backed stand-in for offline runs / load tests
+if LOCAL_STORAGE_DIR:
+    from localstore import LocalSupabase
+    supabase = LocalSupabase(LOCAL_STORAGE_DIR)
+else:
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        raise RuntimeError("SUPABASE_URL and a SUPABASE key must be set in env vars")
+    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+UPLOADER = Uploader(supabase, None if LOCAL_STORAGE_DIR else SUPABASE_URL, SUPABASE_KEY)  # hash-deduplicated uploads
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
+MANUAL_PDF = os.path.join(BASE_DIR, "Automated Letter System - User Manual.pdf")
 os.makedirs(TEMPLATES_DIR, exist_ok=True)
 HF_SPACE_REPO = os.getenv("SPACE_ID") or os.getenv("HF_SPACE_REPO") or "unknown/space"
-CACHED_DATA: List[Dict[str, str]] = []
+RENDER_WORKERS = int(os.getenv("LETTER_WORKERS", "1"))  # >1 renders batches in a process pool
+OUTPUT_DIR = os.getenv("LETTER_OUTPUT_DIR", os.path.join(BASE_DIR, "output"))  # used by the "folder" archive mode
+WORKSPACE = Workspace()  # per-job temp folders, reaped in the background
+WORKSPACE.start_reaper()
+TEMPLATES = TemplateStore(supabase, os.path.join(WORKSPACE.root, "cache", "templates"))  # warm local copies
+TEMPLATES.start()
+CACHED_DATA: Dataset = Dataset()
 CACHED_COLUMNS: List[str] = []
+LISTINGS: Dict[str, List[str]] = {}  # last known filenames per table, so uploads don't re-query everything
 print(f"🚀 Running in Space: {HF_SPACE_REPO}")
 
 # -------------------------
@@ -36,120 +60,51 @@ print(f"🚀 Running in Space: {HF_SPACE_REPO}")
 def list_templates() -> List[str]:
     try:
         response = supabase.table("templates").select("filename").execute()
-        return sorted([r["filename"] for r in response.data])
+        LISTINGS["templates"] = sorted([r["filename"] for r in response.data])
+        return LISTINGS["templates"]
     except Exception as e:
         print("⚠️ Error listing templates:", e)
         return []
 
-def extract_placeholders(template_name: str) -> List[str]:
-    if not template_name:
-        return []
+def listing_with(table: str, filename: str) -> List[str]:
+    """Known filenames of `table` plus `filename`, without listing the whole table again."""
+    if table not in LISTINGS:
+        list_templates() if table == "templates" else list_saved_data()
+    LISTINGS[table] = sorted(set(LISTINGS.get(table, [])) | {filename})
+    return LISTINGS[table]
+
+def template_placeholders(template_name: str) -> Optional[List[str]]:
+    """The template's placeholders, or None if it can't be fetched."""
     path = get_template_path_from_supabase(template_name)
     if not path or not os.path.exists(path):
         print(f"⚠️ Could not fetch template {template_name} from database")
+        return None
+    return compile_template(path).placeholders
+
+def extract_placeholders(template_name: str) -> List[str]:
+    if not template_name:
         return []
-    doc = Document(path)
-    text = " ".join(p.text for p in doc.paragraphs)
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                text += " " + " ".join(p.text for p in cell.paragraphs)
-    matches = re.findall(r"\{\{(.*?)\}\}|\{(.*?)\}", text)
-    return list({(m[0] or m[1]).strip() for m in matches if (m[0] or m[1]).strip()})
-
-def sanitize_filename(name: str) -> str:
-    return re.sub(r"[\\/*?<>|:\"\n\r\t]+", "_", name.strip())[:200]
-
-def replace_placeholders(doc: Document, fields: Dict[str, str]) -> Document:
-    def process_paragraph(par):
-        for run in par.runs:
-            text = run.text
-            for k, v in fields.items():
-                # --- Handle image placeholders ---
-                if k.endswith("image") and v and os.path.exists(v):
-                    if f"{{{k}}}" in text or f"{{{{{k}}}}}" in text:
-                        run.text = text.replace(f"{{{k}}}", "").replace(f"{{{{{k}}}}}", "")
-                        new_run = par.add_run()
-                        new_run.add_picture(v, width=Inches(1.5))
-                        text = run.text
-                
-                # --- Handle text placeholders ---
-                else:
-                    if f"{{{k}}}" in text or f"{{{{{k}}}}}" in text or f"{{{k.upper()}}}" in text:
-                        val = str(v)
-                        if f"{{{k.upper()}}}" in text:
-                            val = val.upper()
-                        run.text = (
-                            text.replace(f"{{{k}}}", val)
-                                .replace(f"{{{{{k}}}}}", val)
-                                .replace(f"{{{k.upper()}}}", val)
-                        )
-                        
-    for p in doc.paragraphs:
-        process_paragraph(p)
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                for p in cell.paragraphs:
-                    process_paragraph(p)
-    return doc
+    return template_placeholders(template_name) or []
 
 def generate_single_docx(template_name: str, fields: Dict[str, str], rename_pattern: Optional[str]) -> str:
     tpl_path = get_template_path_from_supabase(template_name)
     if not tpl_path or not os.path.exists(tpl_path):
         raise FileNotFoundError(f"Template {template_name} not found in database")
-    doc = Document(tpl_path)
-    
-    # Normalize field keys to lowercase before replacement
-    lower_fields = {k.lower(): v for k, v in fields.items()}
-    doc = replace_placeholders(doc, lower_fields)
-    base = os.path.splitext(template_name)[0]
-
-    if rename_pattern:
-        name = rename_pattern
-        # Make matching case-insensitive
-        for k, v in fields.items():
-            pattern = re.compile(rf"\{{{{\s*{re.escape(k)}\s*\}}}}|\{{\s*{re.escape(k)}\s*\}}", re.IGNORECASE)
-            name = pattern.sub(str(v), name)
-        name = sanitize_filename(name) or f"{base}_{uuid.uuid4().hex[:6]}"
-    else:
-        name = f"{base}_{fields.get('name', uuid.uuid4().hex[:6])}"
+    template = compile_template(tpl_path)
 
     # Save temporarily (so user downloads instead of system saving)
-    tmp_dir = tempfile.mkdtemp()
-    out_path = os.path.join(tmp_dir, f"{name}.docx")
-    doc.save(out_path)
-    return out_path
+    with WORKSPACE.job("sample") as tmp_dir:
+        return render_letter(template, fields, rename_pattern, tmp_dir)
 
 # -------------------------
 # Data parsing
 # -------------------------
-def parse_file(path: str) -> List[Dict[str, str]]:
-    ext = os.path.splitext(path)[1].lower()
-    if ext == ".csv":
-        df = pd.read_csv(path, keep_default_na=False)
-    else:
-        df = pd.read_excel(path, keep_default_na=False)
-
-    # Normalize column names: lowercase + replace spaces with underscores
-    df.columns = [str(c).strip().lower().replace(" ", "_") for c in df.columns]
-
-    # Convert each cell, with special handling for dates
-    def format_cell(x):
-        if pd.isna(x):
-            return ""
-        if isinstance(x, (datetime, pd.Timestamp)):
-            return x.strftime("%#d %B %Y") if os.name == "nt" else x.strftime("%-d %B %Y")
-        return str(x).strip()
-
-    records = df.applymap(format_cell).to_dict(orient="records")
-    return records
-
 def parse_pasted_text(text: str) -> Tuple[List[Dict[str, str]], List[str]]:
     rows, errors = [], []
     lines = [l.strip() for l in text.splitlines() if l.strip()]
     for i, line in enumerate(lines, 1):
-        parts = [p.strip() for p in line.split(",") if p.strip()]
+        # Split only on commas that start a new "key:", so values may contain commas
+        parts = [p.strip() for p in re.split(r",(?=\s*[^,:]+:)", line) if p.strip()]
         row = {}
         for part in parts:
             if ":" not in part:
@@ -161,26 +116,16 @@ def parse_pasted_text(text: str) -> Tuple[List[Dict[str, str]], List[str]]:
             rows.append(row)
     return rows, errors
 
-def get_template_path_from_supabase(filename: str) -> Optional[str]:
-    """Download a template file temporarily from Supabase Storage."""
+def get_template_path_from_supabase(filename: str, batch_dir: Optional[str] = None) -> Optional[str]:
+    """Local copy of a template from Supabase Storage (warmed up and kept current by TEMPLATES).
+
+    With `batch_dir`, a snapshot inside it, so a template refreshed mid-batch
+    can't change letters that are still rendering.
+    """
     try:
         if not filename:
             return None
-        # Get file URL from table (database)
-        res = supabase.table("templates").select("file_url").eq("filename", filename).execute()
-        if not res.data:
-            print(f"⚠️ Template not found in database table: {filename}")
-            return None
-        file_url = res.data[0]["file_url"]
-        # Download the .docx file into a temporary path
-        tmp_path = os.path.join(tempfile.gettempdir(), filename)
-        r = requests.get(file_url)
-        if r.status_code == 200:
-            with open(tmp_path, "wb") as f:
-                f.write(r.content)
-            return tmp_path
-        print(f"⚠️ Failed to download from database: HTTP {r.status_code}")
-        return None
+        return TEMPLATES.snapshot(filename, batch_dir) if batch_dir else TEMPLATES.path(filename)
     except Exception as e:
         print("❌ Error fetching template:", e)
         return None
@@ -199,29 +144,19 @@ def handle_upload(upload):
         if not filename.lower().endswith(".docx"):
             return gr.update(), gr.update(), gr.update(), gr.update(), "❌ Only .docx allowed"
 
-        # Upload to Supabase Storage
-        with open(temp_path, "rb") as f:
-            data = f.read()
-        res = supabase.storage.from_("templates").upload(f"templates/{filename}", data)
-
-        # Get public URL
-        public_url = supabase.storage.from_("templates").get_public_url(f"templates/{filename}")
+        # Stream to Supabase Storage (skipped if the same content is already stored)
+        uploaded, _ = UPLOADER.upload("templates", f"templates/{filename}", temp_path, "templates")
+        TEMPLATES.put(filename, temp_path)
 
-        # Insert metadata into database
-        supabase.table("templates").upsert({
-            "filename": filename,
-            "file_url": public_url,
-        }).execute()
-
-        templates = [x["filename"] for x in supabase.table("templates").select("*").execute().data]
-        placeholders = ", ".join(extract_placeholders(filename)) or "No placeholders detected"
+        templates = listing_with("templates", filename)
+        placeholders = ", ".join(compile_template(temp_path).placeholders) or "No placeholders detected"
 
         return (
             gr.update(choices=templates, value=filename),
             gr.update(choices=templates, value=filename),
             gr.update(choices=templates, value=filename),
             placeholders,
-            f"✅ Upload successful '{filename}'"
+            f"✅ Upload successful '{filename}'" if uploaded else f"✅ '{filename}' is unchanged, nothing to upload"
         )
 
     except Exception as e:
@@ -244,6 +179,7 @@ def handle_delete(name: str):
         # Delete database record
         db_resp = supabase.table("templates").delete().eq("filename", name).execute()
         print("🗑️ Table delete:", db_resp)
+        TEMPLATES.forget(name)
 
         # Update dropdowns
         templates = list_templates()
@@ -260,12 +196,35 @@ def handle_delete(name: str):
 
 def load_paste(text: str) -> str:
     global CACHED_DATA, CACHED_COLUMNS
+    # A table copied from Excel (header row + tab/comma separated rows) loads like an uploaded file
+    sep = detect_delimiter(text or "")
+    if sep:
+        try:
+            table = parse_table(text, sep)
+        except ValueError as e:
+            return f"❌ Could not read pasted table: {e}"
+        if not len(table): return "❌ No valid data. The pasted table has a header row but no rows."
+        CACHED_DATA = table
+        CACHED_COLUMNS = sorted(CACHED_DATA.columns)
+        return f"✅ Loaded {len(table)} rows from pasted table. Columns: {', '.join(CACHED_COLUMNS)}"
+
     rows, errors = parse_pasted_text(text)
     if not rows: return "❌ No valid data. " + "; ".join(errors)
-    CACHED_DATA = rows
-    CACHED_COLUMNS = sorted({k for r in rows for k in r})
+    CACHED_DATA = Dataset.from_records(rows)
+    CACHED_COLUMNS = sorted(CACHED_DATA.columns)
     return f"✅ Loaded {len(rows)} rows. Columns: {', '.join(CACHED_COLUMNS)}"
 
+def download_data_file(file_url: str, ext: str) -> str:
+    """Stream a stored data file to a temp path so rows can be read without holding the download in memory."""
+    path = WORKSPACE.download_path(ext)
+    with requests.get(file_url, stream=True) as r, open(path, "wb") as f:
+        if r.status_code != 200:
+            os.remove(path)
+            raise RuntimeError(f"Failed to download file (HTTP {r.status_code})")
+        for chunk in r.iter_content(chunk_size=1 << 20):
+            f.write(chunk)
+    return path
+
 def load_file(upload) -> str:
     global CACHED_DATA, CACHED_COLUMNS
     if not upload:
@@ -277,35 +236,29 @@ def load_file(upload) -> str:
             res = supabase.table("data").select("file_url").eq("filename", upload).execute()
             if not res.data:
                 return f"❌ File '{upload}' not found in database."
-            file_url = res.data[0]["file_url"]
-            from io import BytesIO
-            r = requests.get(file_url)
-            if r.status_code != 200:
-                return f"❌ Failed to download file (HTTP {r.status_code})"
-            ext = os.path.splitext(upload)[1].lower()
-            df = pd.read_csv(BytesIO(r.content)) if ext == ".csv" else pd.read_excel(BytesIO(r.content))
+            path = download_data_file(res.data[0]["file_url"], os.path.splitext(upload)[1].lower())
+            try:
+                CACHED_DATA = Dataset.from_records(iter_records(path))
+            finally:
+                os.remove(path)
         except Exception as e:
             return f"❌ Error reading Supabase file: {e}"
     else:
         # Local upload
         path = upload.name if hasattr(upload, "name") else str(upload)
         try:
-            df = pd.read_csv(path) if path.endswith(".csv") else pd.read_excel(path)
+            CACHED_DATA = Dataset.from_records(iter_records(path))
         except Exception as e:
             return f"❌ Error reading local file: {e}"
 
-    df.columns = [str(c).strip().lower().replace(" ", "_") for c in df.columns]
-    def format_cell(x):
-        if pd.isna(x): return ""
-        if isinstance(x, (datetime, pd.Timestamp)):
-            return x.strftime("%#d %B %Y") if os.name == "nt" else x.strftime("%-d %B %Y")
-        return str(x).strip()
-
-    CACHED_DATA = df.applymap(format_cell).to_dict(orient="records")
-    CACHED_COLUMNS = sorted({k for r in CACHED_DATA for k in r})
+    CACHED_COLUMNS = sorted(CACHED_DATA.columns)
     return f"✅ Loaded {len(CACHED_DATA)} rows. Columns: {', '.join(CACHED_COLUMNS)}"
 
-def gen_sample(template, pattern):
+def _row_index(row_no) -> int:
+    """0-based index of the 1-based row number shown in the UI, kept within the loaded data."""
+    return min(max(int(row_no or 1), 1), max(len(CACHED_DATA), 1)) - 1
+
+def gen_sample(template, pattern, row_no=1):
     if not template: return None, "❌ Select a template"
     if not CACHED_DATA:
         if data_tpl.value:  # if user selected Excel file from dropdown
@@ -314,11 +267,91 @@ def gen_sample(template, pattern):
             if not msg.startswith("✅"):
                 return None, msg
     if not CACHED_DATA: return None, "❌ Load data first"
-    row = dict(CACHED_DATA[0])
+    row = dict(CACHED_DATA[_row_index(row_no)])
     path = generate_single_docx(template, row, pattern)
     return path, f"✅ Sample generated ({os.path.basename(path)})"
 
-def gen_all(template, pattern):
+def preview_row(template, row_no, pattern):
+    """Inline HTML of one row from the cached compiled template (no .docx is written)."""
+    if not template:
+        return "", "Select a template to preview."
+    tpl_path = get_template_path_from_supabase(template)
+    if not tpl_path or not os.path.exists(tpl_path):
+        return "", f"❌ Template {template} not found in database"
+    template_obj = compile_template(tpl_path)
+    if not CACHED_DATA:
+        html, _, _ = render_html(template_obj, {})
+        return html, "Load data to fill in the placeholders."
+    i = _row_index(row_no)
+    row = dict(CACHED_DATA[i])
+    html, unfilled, empty = render_html(template_obj, row)
+    info = f"Row {i + 1} of {len(CACHED_DATA)} → {letter_filename(template_obj.name, row, pattern)}.docx"
+    notes = [f"Not filled: {', '.join(dict.fromkeys(unfilled))}"] if unfilled else []
+    notes += [f"Empty: {', '.join(dict.fromkeys(empty))}"] if empty else []
+    if notes:
+        info += "\n⚠️ " + " · ".join(notes)
+    return html, info
+
+def step_row(row_no, delta: int) -> int:
+    """Row number after pressing ◀ / ▶."""
+    return _row_index(_row_index(row_no) + 1 + delta) + 1
+
+OUTPUT_FORMATS = [
+    ("Separate letters (.docx)", "docx"),
+    ("One merged document (for printing)", "merged"),
+    ("PDF letters", "pdf"),
+]
+
+def render_batch(jobs, errors, tmp_dir, prefix, output_format="docx", workers=RENDER_WORKERS):
+    """Render jobs as separate letters, one merged document or PDFs. Returns (files, letter count).
+
+    For PDF output the files are a live stream from the converter pool, so
+    the archive is written while later letters are still converting. The
+    count is then the .docx count; the PDFs are counted by the stream
+    (CountedFiles) once it has been packaged.
+    """
+    if output_format == "merged":
+        path = os.path.join(tmp_dir, f"{prefix}_merged_{uuid.uuid4().hex[:6]}.docx")
+        count = merge_letters(jobs, path, errors)
+        return ([path] if count else []), count
+    # Start the converters first, so a missing LibreOffice fails before anything is rendered
+    pool = get_pdf_pool() if output_format == "pdf" else None
+    files = run_jobs(jobs, workers, errors)
+    if pool and files:
+        return CountedFiles(pool.convert(files, errors)), len(files)
+    return files, len(files)
+
+class CountedFiles:
+    """A live file stream that counts what it has yielded, so failed PDF conversions aren't reported as letters."""
+
+    def __init__(self, files):
+        self._files = iter(files)
+        self.count = 0
+
+    def __iter__(self):
+        for f in self._files:
+            self.count += 1
+            yield f
+
+def package_letters(out_files, tmp_dir, prefix, archive_mode="stored", level=6, volume_mb=0, output_format="docx"):
+    """Archive (or export) rendered letters. Returns (files for the download box, status note)."""
+    job = f"{prefix}_{uuid.uuid4().hex[:6]}"
+    archive_mode = archive_mode or "stored"
+    if archive_mode == "folder":
+        out_dir = os.path.join(OUTPUT_DIR, job)
+        package(out_files, "", "folder", out_dir=out_dir)
+        return None, f"saved to {out_dir}"
+    if output_format == "merged":
+        return out_files, "one merged document, Download below"  # a single .docx needs no ZIP
+    paths = package(
+        out_files, os.path.join(tmp_dir, f"{job}.zip"), archive_mode,
+        level=int(level) if level is not None else None,
+        volume_size=int(float(volume_mb or 0) * 1024 * 1024),
+    )
+    note = "Download below" if len(paths) == 1 else f"{len(paths) - 1} volumes + manifest below"
+    return paths, note
+
+def gen_all(template, pattern, archive_mode="stored", level=6, volume_mb=0, output_format="docx", profile=PROFILE_BATCHES):
     if not template:
         return None, "❌ Select a template"
     if not CACHED_DATA:
@@ -330,120 +363,92 @@ def gen_all(template, pattern):
     if not CACHED_DATA:
         return None, "❌ Load data first"
 
-    out_files = []
-    tmp_dir = tempfile.mkdtemp()  # Create temp folder
-
-    for row in CACHED_DATA:
-        row = dict(row)
-        out_files.append(generate_single_docx(template, row, pattern))
-
-    # Create zip in same temp folder
-    zip_path = os.path.join(tmp_dir, f"letters_{uuid.uuid4().hex[:6]}.zip")
-    with zipfile.ZipFile(zip_path, "w") as z:
-        for f in out_files:
-            z.write(f, arcname=os.path.basename(f))
+    errors = []
+    with WORKSPACE.job("letters") as tmp_dir:  # Create job folder
+        tpl_path = get_template_path_from_supabase(template, tmp_dir)
+        if not tpl_path or not os.path.exists(tpl_path):
+            return None, f"❌ Template {template} not found in database"
+        jobs = letter_jobs(tpl_path, CACHED_DATA, pattern, tmp_dir, template)
+        try:
+            # Profiling only sees this thread, so render in-process while it's on
+            with profile_batch(profile, tmp_dir, "letters") as prof:
+                out_files, count = render_batch(jobs, errors, tmp_dir, "letters", output_format, 1 if prof else RENDER_WORKERS)
+                if not count:
+                    return None, f"❌ No letters generated.\nErrors: {'; '.join(errors[:5])}"
+
+                # Create zip(s) in same temp folder
+                zip_paths, note = package_letters(out_files, tmp_dir, "letters", archive_mode, level, volume_mb, output_format)
+                if isinstance(out_files, CountedFiles):
+                    count = out_files.count
+                    if not count:
+                        return None, f"❌ No letters generated.\nErrors: {'; '.join(errors[:5])}"
+        except (RuntimeError, ValueError) as e:  # e.g. PDF output without LibreOffice, or a merge of mixed templates
+            return None, f"❌ {e}"
+        if prof:
+            zip_paths = attach(zip_paths, prof.files)
+            note += ", profile attached"
+
+    msg = f"✅ {count} letters generated ({note})"
+    if errors:
+        msg += f"\n⚠️ Some issues:\n" + "\n".join(errors[:5])
+    return zip_paths, msg
 
-    return zip_path, f"✅ {len(out_files)} letters generated (Download below)"
+def check_data(template):
+    """Pre-flight: compare the template's placeholders with the loaded data before generating."""
+    if not template:
+        return "❌ Select a template"
+    if not CACHED_DATA:
+        return "❌ Load data first"
+    return check_letters(template_placeholders(template), CACHED_DATA, template=template).summary()
 
 # -------------------------
 # Viva Letters Generator
 # -------------------------
-def generate_viva_letters(rename_prefix: Optional[str] = None):
+def generate_viva_letters(rename_prefix: Optional[str] = None, archive_mode="stored", level=6, volume_mb=0, output_format="docx", profile=PROFILE_BATCHES):
     global STUDENT_DATA
     if not STUDENT_DATA:
         return None, "⚠️ No students loaded."
 
-    tmp_dir = tempfile.mkdtemp()
-    out_files = []
     errors = []
-
-    for s in STUDENT_DATA:
-        # --- Normalize keys ---
-        s = {k.lower(): str(v).strip() for k, v in s.items() if v is not None}
-        name = s.get("name", s.get("nama", "")).strip()
-        tpl_choice = s.get("template", "").strip()
-        program_val = s.get("program", "").strip()
-        degree_val = s.get("degree", "").strip() or s.get("jenis_degree", "").strip()
-
-        # --- Handle date ---
-        date_raw = s.get("tarikh_viva", s.get("date", "")).strip()
-        if not date_raw:
-            date_val = datetime.now()
-        else:
-            try:
-                date_val = pd.to_datetime(date_raw, errors="coerce")
-                if pd.isna(date_val):
-                    date_val = datetime.now()
-            except Exception:
-                date_val = datetime.now()
-        date_val = date_val.strftime("%#d %B %Y") if os.name == "nt" else date_val.strftime("%-d %B %Y")
-
-        if not name:
-            errors.append("Missing student name.")
-            continue
-        if not tpl_choice:
-            errors.append(f"No template selected for {name}.")
-            continue
-
-        # --- Locate template ---
-        tpl_file = next((f for f in list_templates() if tpl_choice.lower() in f.lower()), None)
-        if not tpl_file:
-            errors.append(f"Template '{tpl_choice}' not found.")
-            continue
-
-        # --- Fill placeholders ---
-        s["name"] = name
-        s["nama"] = name
-        s["program"] = program_val
-        s["degree"] = degree_val
-        s["jenis_degree"] = degree_val  # ✅ now matches Degree dropdown, not Program
-        s["tarikh_submit"] = date_val
-        s["tarikh"] = date_val
-
-        tpl_path = get_template_path_from_supabase(tpl_file)
-        if not tpl_path or not os.path.exists(tpl_path):
-            errors.append(f"❌ Failed to download template {tpl_file} from database")
-            continue
-        doc = Document(tpl_path)
-        fields = {k.lower(): v for k, v in s.items()}
-        doc = replace_placeholders(doc, fields)
-
-        # --- Rename pattern ---
-        if rename_prefix and rename_prefix.strip():
-            rename_pattern = rename_prefix
-            for key, val in s.items():
-                rename_pattern = rename_pattern.replace(f"{{{key}}}", val)
-                rename_pattern = rename_pattern.replace(f"{{{key.upper()}}}", val.upper())
-        else:
-            base = os.path.splitext(tpl_file)[0]
-            rename_pattern = base
-
-        safe_name = re.sub(r"[^\w\s-]", "", rename_pattern).strip().replace(" ", "_")
-        output_path = os.path.join(tmp_dir, f"{safe_name}.docx")
-
+    with WORKSPACE.job("viva_letters") as tmp_dir:
         try:
-            doc.save(output_path)
-            out_files.append(output_path)
-        except Exception as e:
-            errors.append(f"{name}: {e}")
-
-    if not out_files:
-        return None, f"❌ No valid letters generated.\nErrors: {'; '.join(errors)}"
-
-    zip_path = os.path.join(tmp_dir, f"viva_letters_{uuid.uuid4().hex[:6]}.zip")
-    with zipfile.ZipFile(zip_path, "w") as z:
-        for f in out_files:
-            z.write(f, arcname=os.path.basename(f))
-
-    msg = f"✅ Generated {len(out_files)} viva letters."
+            with profile_batch(profile, tmp_dir, "viva_letters") as prof:
+                jobs = viva_jobs(
+                    STUDENT_DATA, list_templates(), lambda name: get_template_path_from_supabase(name, tmp_dir),
+                    rename_prefix, tmp_dir, errors,
+                )
+                out_files, count = render_batch(jobs, errors, tmp_dir, "viva_letters", output_format, 1 if prof else RENDER_WORKERS)
+
+                if not count:
+                    return None, f"❌ No valid letters generated.\nErrors: {'; '.join(errors)}"
+
+                zip_paths, note = package_letters(out_files, tmp_dir, "viva_letters", archive_mode, level, volume_mb, output_format)
+                if isinstance(out_files, CountedFiles):
+                    count = out_files.count
+                    if not count:
+                        return None, f"❌ No valid letters generated.\nErrors: {'; '.join(errors)}"
+        except (RuntimeError, ValueError) as e:  # e.g. PDF output without LibreOffice, or a merge of mixed templates
+            return None, f"❌ {e}"
+        if prof:
+            zip_paths = attach(zip_paths, prof.files)
+            note += ", profile attached"
+
+    msg = f"✅ Generated {count} viva letters ({note})."
     if errors:
         msg += f"\n⚠️ Some issues:\n" + "\n".join(errors[:5])
 
-    return zip_path, msg
+    return zip_paths, msg
+
+def check_students():
+    """Pre-flight for the viva tab: names, template assignments, dates and placeholders."""
+    if not STUDENT_DATA:
+        return "⚠️ No students loaded."
+    return check_viva(STUDENT_DATA, list_templates(), template_placeholders).summary()
 
 def load_excel_students(file):
     global STUDENT_DATA
-    STUDENT_DATA = []
+    STUDENT_DATA = Dataset()
+    index_students([])
 
     if not file:
         return (*(gr.update(visible=False),) * 8,"⚠️ Please upload an Excel file.")
@@ -460,7 +465,7 @@ def load_excel_students(file):
                 "❌ File must include a 'nama' or 'name' column."
             )
 
-        STUDENT_DATA = []
+        STUDENT_DATA = Dataset()
         for _, r in df.iterrows():
             name = str(r.get(name_col, "")).strip()
             
@@ -498,8 +503,8 @@ def load_excel_students(file):
 
             STUDENT_DATA.append(record)
 
-        rows = [[s["name"], s["template"], s["date"], s["program"], s["degree"]] for s in STUDENT_DATA]
-        names = [s["name"] for s in STUDENT_DATA]
+        rows = [student_table_row(s) for s in STUDENT_DATA]
+        names = index_students(rows)
 
         return (
             gr.update(value=rows, visible=True, interactive=False),  # student_table
@@ -521,23 +526,33 @@ def load_excel_students(file):
     except Exception as e:
         return (*(gr.update(visible=False),) * 10, f"❌ Error reading file: {e}")
 
-STUDENT_DATA = []
+STUDENT_DATA: Dataset = Dataset()
+STUDENT_INDEX: RowIndex = RowIndex(STUDENT_DATA)
+STUDENT_TABLE: List[List[str]] = []  # rows shown in student_table, same order as STUDENT_DATA
+
+def student_table_row(s) -> List[str]:
+    return [
+        s.get("name") or s.get("nama") or "",
+        s.get("template", ""),
+        s.get("date", ""),
+        s.get("program", ""),
+        s.get("degree", "")
+    ]
+
+def index_students(table_rows: List[List[str]]) -> List[str]:
+    """Index the freshly loaded STUDENT_DATA and remember its table. Returns the dropdown labels."""
+    global STUDENT_INDEX, STUDENT_TABLE
+    STUDENT_INDEX = RowIndex(STUDENT_DATA)
+    STUDENT_TABLE = table_rows
+    return STUDENT_INDEX.labels
+
 def select_student(student_name):
     """
     Load selected student's saved values into the dropdown menus and text fields.
     Works for Viva tab: Template, Program, Degree, Date.
     """
-    global STUDENT_DATA
-    if not student_name:
-        return (
-            gr.update(value="", interactive=True, visible=True),
-            gr.update(value="", interactive=True, visible=True),
-            gr.update(value="", interactive=True, visible=True),
-            gr.update(value="", interactive=True, visible=True)
-        )
-
-    student = next((s for s in STUDENT_DATA if str(s.get("name", s.get("nama", ""))).strip() == student_name), None)
-    if not student:
+    i = STUDENT_INDEX.find(student_name) if student_name else None
+    if i is None:
         return (
             gr.update(value="", interactive=True, visible=True),
             gr.update(value="", interactive=True, visible=True),
@@ -545,6 +560,7 @@ def select_student(student_name):
             gr.update(value="", interactive=True, visible=True)
         )
 
+    student = STUDENT_DATA[i]
     template_val = str(student.get("template", "")).strip()
     program_val = str(student.get("program", "")).strip()
     degree_val = str(student.get("degree", student.get("jenis_degree", ""))).strip()
@@ -562,37 +578,49 @@ def select_student(student_name):
 def save_student(name, tpl, prog, degree, date):
     if not name:
         return gr.update(), "⚠️ Select a student first."
-    # s = next((x for x in STUDENT_DATA if x["name"] == name), None)
-    # new safe version
-    s = next(
-        (
-            x
-            for x in STUDENT_DATA
-            if (
-                x.get("name") == name
-                or x.get("Name") == name
-                or x.get("Student Name") == name
-                or x.get("Nama") == name
-                or x.get("nama") == name
-            )
-        ),
-        None,
-    )
-    if s:
-        s["template"] = tpl
-        s["program"] = prog
-        s["degree"] = degree
-        s["jenis_degree"] = degree  # link degree dropdown to placeholder
-        s["date"] = date
-        s["tarikh_viva"] = date
-    rows = [[
-        x.get("name") or x.get("nama") or "",
-        x.get("template", ""),
-        x.get("date", ""),
-        x.get("program", ""),
-        x.get("degree", "")
-    ] for x in STUDENT_DATA]
-    return gr.update(value=rows), f"✅ Saved {name}'s info."
+    i = STUDENT_INDEX.find(name)
+    if i is None:
+        return gr.update(), f"⚠️ Student '{name}' not found."
+
+    s = STUDENT_DATA[i]
+    s["template"] = tpl
+    s["program"] = prog
+    s["degree"] = degree
+    s["jenis_degree"] = degree  # link degree dropdown to placeholder
+    s["date"] = date
+    s["tarikh_viva"] = date
+
+    # Only the edited row changes; the rest of the table is reused as-is
+    STUDENT_TABLE[i] = student_table_row(s)
+    return gr.update(value=STUDENT_TABLE), f"✅ Saved {name}'s info."
+
+def bulk_assign(column, value, tpl, prog, degree, date):
+    """Apply the chosen template/program/degree/date to every student whose `column` equals `value`.
+
+    An empty value selects all students; empty fields are left unchanged.
+    """
+    if not STUDENT_DATA:
+        return gr.update(), "⚠️ No students loaded."
+    column = normalize_column(column or "")
+    if value and str(value).strip():
+        if column not in STUDENT_DATA.columns:
+            return gr.update(), f"⚠️ Column '{column}' not found."
+        rows = STUDENT_DATA.find(column, value)
+    else:
+        rows = range(len(STUDENT_DATA))
+    if not rows:
+        return gr.update(), f"⚠️ No students with {column} = '{value}'."
+
+    updates = {"template": tpl, "program": prog, "degree": degree, "jenis_degree": degree, "date": date, "tarikh_viva": date}
+    updates = {k: v for k, v in updates.items() if v}
+    if not updates:
+        return gr.update(), "⚠️ Choose at least one value to assign."
+    for field, val in updates.items():
+        STUDENT_DATA.fill(field, val, rows)
+
+    for i in rows:
+        STUDENT_TABLE[i] = student_table_row(STUDENT_DATA[i])
+    return gr.update(value=STUDENT_TABLE), f"✅ Updated {len(rows)} students."
 
 # -------------------------
 # Data Handlers
@@ -600,35 +628,22 @@ def save_student(name, tpl, prog, degree, date):
 def list_saved_data():
     try:
         res = supabase.table("data").select("filename").execute()
-        return sorted([r["filename"] for r in res.data])
+        LISTINGS["data"] = sorted([r["filename"] for r in res.data])
+        return LISTINGS["data"]
     except Exception as e:
         print("⚠️ Could not list Excel data:", e)
         return []
 
 def upload_data(file):
     filename = os.path.basename(file)
-    folder = "data"
-    file_path = f"{folder}/{filename}"
     try:
-        # Delete old file from storage if exists
-        try:
-            supabase.storage.from_(folder).remove([filename])
-        except Exception:
-            pass
-
-        # Upload file to storage
-        with open(file, "rb") as f:
-            supabase.storage.from_(folder).upload(filename, f)
-        public_url = supabase.storage.from_(folder).get_public_url(filename)
-
-        # Upsert into Supabase table "data"
-        supabase.table("data").upsert({
-            "filename": filename,
-            "file_url": public_url
-        }).execute()
+        # Stream (or chunk, if large) to storage; skipped if the same content is already stored
+        uploaded, _ = UPLOADER.upload("data", filename, file, "data")
 
         # Update dropdown list
-        files = list_saved_data()
+        files = listing_with("data", filename)
+        if not uploaded:
+            return gr.update(choices=files, value=filename), f"✅ '{filename}' is unchanged, nothing to upload"
         return gr.update(choices=files, value=filename), f"✅ Upload successful '{filename}'"
 
     except Exception as e:
@@ -666,16 +681,17 @@ def preview_excel(selected_file):
         import requests
         from io import BytesIO
         r = requests.get(res.data[0]["file_url"])
-        df = pd.read_excel(BytesIO(r.content))
+        df = pd.read_excel(BytesIO(r.content), nrows=10)
 
-        return gr.update(value=df.head(10), visible=True), gr.update(value="")
+        return gr.update(value=df, visible=True), gr.update(value="")
     except Exception as e:
         return gr.update(visible=False), gr.update(value=f"❌ Error previewing file: {e}")
 
 def load_saved_excel(selected_file):
     global STUDENT_DATA, CACHED_DATA
-    STUDENT_DATA = []
-    CACHED_DATA = []
+    STUDENT_DATA = Dataset()
+    CACHED_DATA = Dataset()
+    index_students([])
 
     if not selected_file:
         return (*(gr.update(visible=False),) * 10, "❌ No file selected")
@@ -686,36 +702,33 @@ def load_saved_excel(selected_file):
         if not res.data:
             return (*(gr.update(visible=False),) * 10, f"❌ File '{selected_file}' not found in database")
 
-        file_url = res.data[0]["file_url"]
-        import requests
-        from io import BytesIO
-
-        r = requests.get(file_url)
-        if r.status_code != 200:
-            return (*(gr.update(visible=False),) * 10, f"❌ Failed to download file (HTTP {r.status_code})")
-
-        # Load Excel file
-        df = pd.read_excel(BytesIO(r.content))
-        df.columns = [str(c).strip().lower().replace(" ", "_") for c in df.columns]
+        # Stream the file from storage and read it row by row
+        try:
+            path = download_data_file(res.data[0]["file_url"], os.path.splitext(selected_file)[1].lower())
+        except RuntimeError as e:
+            return (*(gr.update(visible=False),) * 10, f"❌ {e}")
+        try:
+            records = Dataset.from_records(iter_records(path))
+        finally:
+            os.remove(path)
 
         # Basic validation
-        if "name" not in df.columns and "nama" not in df.columns:
+        if "name" not in records.columns and "nama" not in records.columns:
             return (*(gr.update(visible=False),) * 10, "❌ Excel file must include a 'Name' or 'Nama' column")
 
-        # Convert to dict
-        STUDENT_DATA = df.to_dict(orient="records")
+        STUDENT_DATA = records
         CACHED_DATA = STUDENT_DATA
-        rows = df.values.tolist()
-        student_names = [r.get("name") or r.get("nama") for r in STUDENT_DATA]
-        
-        # Build empty template assignment table 
-        table_rows = [[ 
-            r.get("name") or r.get("nama") or "", 
-            "", # template 
-            "", # date (user fills later) 
-            r.get("program", ""), 
-            r.get("degree", "") 
-        ] for r in STUDENT_DATA]
+        names = [n or m for n, m in zip(STUDENT_DATA.column("name"), STUDENT_DATA.column("nama"))]
+
+        # Build assignment table; templates come from a 'template' column if the file has one,
+        # dates are filled later
+        table_rows = [
+            [name, template, "", program, degree]
+            for name, template, program, degree in zip(
+                names, STUDENT_DATA.column("template"), STUDENT_DATA.column("program"), STUDENT_DATA.column("degree")
+            )
+        ]
+        student_names = index_students(table_rows)
         
         result = (
             gr.update(value=table_rows, visible=True, interactive=False),  # show template table
@@ -728,7 +741,7 @@ def load_saved_excel(selected_file):
             gr.update(visible=True),  # generate button
             gr.update(visible=True),  # rename textbox
             gr.update(visible=True),  # zip output
-            f"✅ Loaded '{selected_file}' with {len(df)} records"
+            f"✅ Loaded '{selected_file}' with {len(STUDENT_DATA)} records"
         )
         if not isinstance(result[-1], str):
             result = (*result[:-1], str(result[-1]))
@@ -746,7 +759,7 @@ def refresh_data(file):
         choices = dropdown_update.get("choices")
 
     if choices:
-        latest_file = choices[-1]
+        latest_file = os.path.basename(file)
         preview_update, preview_status = preview_excel(latest_file)
         if isinstance(preview_status, dict):
             preview_text = preview_status.get("value", "")
@@ -764,7 +777,7 @@ def refresh_data(file):
 # Chatbot - FULLY WORKING & FAST (NO IMPORT ERRORS)
 # -------------------------
 
-# Simple rule-based + FAQ assistant – works instantly, no GPU needed
+# FAQ + user manual assistant (BM25 index, see helpindex.py) – works instantly, no GPU needed
 FAQ = {
     "template": "1. Open Microsoft Word\n2. Write your letter normally\n3. Use placeholders like {name}, {student_id}, {date}, {program}\n   Example: Dear {name}, your viva is on {tarikh_viva}\n4. Save as .docx → go to 'Manage Templates' → Upload",
     
@@ -772,7 +785,7 @@ FAQ = {
     
     "how to rename": "In the 'Rename Files' box, type a pattern using placeholders:\n• Offer_Letter_{name}\n• Viva_{program}_{name}\n• {student_id}_Result\nLeave blank → uses template name + random code",
     
-    "paste data": "Use this format (one person per line):\nname: Ahmad, student_id: A123, address: Kuala Lumpur\nname: Siti, student_id: A124, program: LT750",
+    "paste data": "Use this format (one person per line):\nname: Ahmad, student_id: A123, address: Kuala Lumpur\nname: Siti, student_id: A124, program: LT750\n\nOr copy rows straight from Excel, including the header row, and paste them as-is.",
     
     "viva": "Steps for viva letters:\n1. Go to 'Generate Viva Result Letters'\n2. Choose or upload Excel file\n3. Select each student → assign Template + Program + Degree\n4. Click 'Save Changes'\n5. (Optional) Type rename pattern\n6. Click 'Generate Viva Letters'",
     
@@ -782,31 +795,34 @@ FAQ = {
     
     "date": "Just put any date in Excel (e.g. 20/10/2025, 2025-10-20, or Excel serial)\nIt will become: 20 October 2025 automatically",
     
-    "sample": "Click 'Generate Sample' to see one letter before generating all.\nGreat for checking formatting!",
+    "sample": "The preview under 'Generate Letters' shows the letter for any row — use ◀ / ▶ or type a row number.\nRed = no such column, yellow = empty cell, purple = placeholder Word split apart (retype it in the template).\nClick 'Generate Sample' to download that row as a .docx.",
 
     "creator": "This system was created by Deliena Tasha Binti Abdul Rahim\nxdeliena on GitHub"
 }
 
-def chat_helper(message, history):
-    msg = message.strip().lower()
+# What the chatbot offers when it has no answer, and the FAQ entry each must find
+SUGGESTED_QUESTIONS = {
+    "how to create template": "template",
+    "placeholder format": "placeholder",
+    "how to rename files": "how to rename",
+    "viva letter steps": "viva",
+    "excel format": "excel",
+    "common errors": "error",
+    "creator": "creator",
+}
+
+HELP_INDEX = build_help_index(FAQ, MANUAL_PDF)  # built once; queries take well under a millisecond
+for problem in check_answers(HELP_INDEX, FAQ, SUGGESTED_QUESTIONS):
+    print("⚠️ Chatbot:", problem)
 
-    # Find the best matching FAQ key
-    response = None
-    for key, answer in FAQ.items():
-        if key in msg:
-            response = answer
-            break
+def chat_helper(message, history):
+    # Best matching FAQ answer or manual passage (tolerates typos)
+    response = HELP_INDEX.answer(message.strip())
 
     if not response:
         response = ("I'm still learning! Here are things I can help with:\n"
-                    "• how to create template\n"
-                    "• placeholder format\n"
-                    "• how to rename files\n"
-                    "• viva letter steps\n"
-                    "• excel format\n"
-                    "• common errors\n"
-                    "• creator\n"
-                    "Just type any of those keywords!")
+                    + "".join(f"• {q}\n" for q in SUGGESTED_QUESTIONS)
+                    + "Or ask about anything in the user manual!")
 
     # Add to history
     history.append((message, response))
@@ -830,7 +846,13 @@ textarea::placeholder {font-style: italic;}
 """
 #Example of use: with gr.Column(elem_id="col_size"):
 
-with gr.Blocks(css=CSS, title="Automated Letter System") as demo:
+def workspace_usage() -> str:
+    s = WORKSPACE.stats()
+    return (f"{s['mb']} MB in use — {s['jobs']} jobs ({s['running_jobs']} running), "
+            f"{s['templates']} cached templates, {s['downloads']} data downloads")
+
+# Gradio keeps its own copies of returned files; expire them on the same schedule
+with gr.Blocks(css=CSS + PREVIEW_CSS, title="Automated Letter System", delete_cache=(REAP_INTERVAL, WORKSPACE_TTL)) as demo:
     gr.Markdown("# 📄 Automated Letter System")
     
     with gr.Tab("Tutorial"):
@@ -856,7 +878,7 @@ with gr.Blocks(css=CSS, title="Automated Letter System") as demo:
     
             1. **Manage Templates** — Upload `.docx` templates (use placeholders like `{name}`, `{address}`, `{student_id}`).
             2. **Generate Letters** — Select a template, then either paste rows of data or upload a CSV/XLSX file.
-            3. **Preview** — Generate a single sample letter to check formatting.
+            3. **Preview** — Check each row in the preview below the buttons (◀ / ▶ steps through rows). Placeholders that won't be filled are highlighted. **Generate Sample** downloads the previewed row as a .docx.
             4. **Generate All** — Create letters for every row and download as a ZIP.
             
             **Data format (paste):**
@@ -864,6 +886,7 @@ with gr.Blocks(css=CSS, title="Automated Letter System") as demo:
             name: Ali, student_id: 2025A001, address: Shah Alam
             name: Siti, student_id: 2025A002, address: Johor
             ```
+            Or copy the rows straight from Excel **with the header row** and paste them — tab- or comma-separated tables are detected automatically.
     
             **File renaming examples**
             - Leave `Rename Files` blank → filenames use template name + unique suffix.
@@ -913,6 +936,8 @@ with gr.Blocks(css=CSS, title="Automated Letter System") as demo:
                - Viva date (auto-filled if in Excel)
 
             3. **Save Changes** — Click **Save Changes** to apply selections.
+               For a whole cohort, open **Bulk Assign** and apply a template to every student with e.g. `program = LT750`,
+               or add a `Template` column to the Excel file.
 
             4. **Generate Letters** — When all students are ready, enter a rename pattern (optional) like:
                - `Viva_Result_{name}`
@@ -937,21 +962,43 @@ with gr.Blocks(css=CSS, title="Automated Letter System") as demo:
                     paste_btn = gr.Button("Enter Data", elem_classes="small-btn")
                 with gr.Group():
                     sample_out = gr.File(label="Sample File", interactive=False)
-                    sample_btn = gr.Button("Generate Sample", elem_classes="small-btn")
+                    sample_btn = gr.Button("Generate Sample (.docx of the preview row)", elem_classes="small-btn")
             
             with gr.Column():
                 placeholders_box_gen = gr.Textbox(label="Placeholders", interactive=False, lines=3,max_lines=3)
                 status = gr.Textbox(label="Status", interactive=False, lines=3,max_lines=3)
                 with gr.Group():
-                    all_out = gr.File(label="All Letters (ZIP)", interactive=False)
+                    all_out = gr.File(label="All Letters (ZIP)", file_count="multiple", interactive=False)
                     all_btn = gr.Button("Generate All", elem_classes="small-btn")
-        
+                check_btn = gr.Button("Check Data", elem_classes="small-btn")
+                with gr.Accordion("Output Options", open=False):
+                    output_format = gr.Dropdown(label="Format", choices=OUTPUT_FORMATS, value="docx", interactive=True)
+                    archive_mode = gr.Dropdown(label="Archive", choices=ARCHIVE_MODES, value="stored", interactive=True)
+                    zip_level = gr.Slider(label="Compression level (deflate only)", minimum=0, maximum=9, step=1, value=6)
+                    volume_mb = gr.Number(label="Split into volumes of (MB, 0 = single ZIP)", value=0, precision=0)
+                    profile_box = gr.Checkbox(label="Profile this batch (adds profile files to the ZIP)", value=PROFILE_BATCHES)
+
+        with gr.Group():
+            with gr.Row():
+                prev_btn = gr.Button("◀ Previous", elem_classes="small-btn")
+                preview_no = gr.Number(label="Preview row", value=1, precision=0, minimum=1)
+                next_btn = gr.Button("Next ▶", elem_classes="small-btn")
+            preview_info = gr.Textbox(label="Preview", interactive=False, lines=2, max_lines=2)
+            preview_html = gr.HTML()
+
+        preview_args = ([gen_tpl, preview_no, rename], [preview_html, preview_info])
         #data_tpl.change(load_saved_excel, [data_tpl], [status])
-        data_tpl.change(load_file, [data_tpl], [status])
-        paste_btn.click(load_paste, [paste], [status])
-        sample_btn.click(gen_sample, [gen_tpl, rename], [sample_out, status])
+        data_tpl.change(load_file, [data_tpl], [status]).then(preview_row, *preview_args)
+        paste_btn.click(load_paste, [paste], [status]).then(preview_row, *preview_args)
+        sample_btn.click(gen_sample, [gen_tpl, rename, preview_no], [sample_out, status])
         gen_tpl.change(lambda t: ", ".join(extract_placeholders(t)) if t else "No placeholders detected",inputs=[gen_tpl],outputs=[placeholders_box_gen])
-        all_btn.click(gen_all, [gen_tpl, rename], [all_out, status])
+        gen_tpl.change(preview_row, *preview_args)
+        preview_no.change(preview_row, *preview_args)
+        rename.blur(preview_row, *preview_args)
+        prev_btn.click(lambda n: step_row(n, -1), [preview_no], [preview_no])
+        next_btn.click(lambda n: step_row(n, 1), [preview_no], [preview_no])
+        check_btn.click(check_data, [gen_tpl], [status])
+        all_btn.click(gen_all, [gen_tpl, rename, archive_mode, zip_level, volume_mb, output_format, profile_box], [all_out, status])
 
     with gr.Tab("Generate Viva Result Letters"):
         gr.Markdown("### 🎓 Viva Exam Result Letter Generator\nUpload student data, assign templates/programs, and generate all letters at once.")
@@ -985,13 +1032,33 @@ with gr.Blocks(css=CSS, title="Automated Letter System") as demo:
         date_box = gr.Textbox(label="Date (auto-filled if available)", visible=False)
         save_btn = gr.Button("Save Changes", elem_classes="small-btn", visible=False)
     
+        # Bulk Assign
+        with gr.Accordion("Bulk Assign", open=False):
+            gr.Markdown("Assign to every student whose column matches the value (leave value blank for everyone).")
+            with gr.Row():
+                bulk_column = gr.Dropdown(label="Column", choices=["program", "degree", "template"], value="program", allow_custom_value=True, interactive=True)
+                bulk_value = gr.Textbox(label="Equals", placeholder="e.g., LT750")
+            with gr.Row():
+                bulk_template = gr.Dropdown(label="Template", choices=TEMPLATE_OPTIONS, interactive=True)
+                bulk_program = gr.Dropdown(label="Program", choices=PROGRAM_OPTIONS, interactive=True)
+                bulk_degree = gr.Dropdown(label="Degree", choices=DEGREE_OPTIONS, allow_custom_value=True, interactive=True)
+                bulk_date = gr.Textbox(label="Date")
+            bulk_btn = gr.Button("Apply to Matching Students", elem_classes="small-btn")
+
         # Rename Pattern Box
         rename_viva_box = gr.Textbox(label="Rename Viva Letters (Optional)", placeholder="e.g., Viva_Letter_{name}", visible=False)
     
         # Generate Buttons
         with gr.Group():
-            out_viva_zip = gr.File(label="Generated Viva Letters (ZIP)", interactive=False, visible=False)
+            out_viva_zip = gr.File(label="Generated Viva Letters (ZIP)", file_count="multiple", interactive=False, visible=False)
             generate_viva_btn = gr.Button("Generate Viva Letters", elem_classes="small-btn", visible=False)
+        check_viva_btn = gr.Button("Check Students", elem_classes="small-btn")
+        with gr.Accordion("Output Options", open=False):
+            viva_output_format = gr.Dropdown(label="Format", choices=OUTPUT_FORMATS, value="docx", interactive=True)
+            viva_archive_mode = gr.Dropdown(label="Archive", choices=ARCHIVE_MODES, value="stored", interactive=True)
+            viva_zip_level = gr.Slider(label="Compression level (deflate only)", minimum=0, maximum=9, step=1, value=6)
+            viva_volume_mb = gr.Number(label="Split into volumes of (MB, 0 = single ZIP)", value=0, precision=0)
+            viva_profile_box = gr.Checkbox(label="Profile this batch (adds profile files to the ZIP)", value=PROFILE_BATCHES)
     
         # Logic Wiring
         load_excel_btn.click(
@@ -1014,7 +1081,9 @@ with gr.Blocks(css=CSS, title="Automated Letter System") as demo:
 
         student_dropdown.change(select_student,[student_dropdown],[template_dropdown, program_dropdown, degree_dropdown, date_box])
         save_btn.click(save_student,[student_dropdown, template_dropdown, program_dropdown, degree_dropdown, date_box],[student_table, status_box])
-        generate_viva_btn.click(generate_viva_letters,[rename_viva_box],[out_viva_zip, status_box],show_progress=True
+        check_viva_btn.click(check_students, None, [status_box])
+        bulk_btn.click(bulk_assign,[bulk_column, bulk_value, bulk_template, bulk_program, bulk_degree, bulk_date],[student_table, status_box])
+        generate_viva_btn.click(generate_viva_letters,[rename_viva_box, viva_archive_mode, viva_zip_level, viva_volume_mb, viva_output_format, viva_profile_box],[out_viva_zip, status_box],show_progress=True
         ).then(lambda zip_file: gr.update(visible=True, value=zip_file),[out_viva_zip],[out_viva_zip])
 
     with gr.Tab("Manage Data"):
@@ -1039,10 +1108,15 @@ with gr.Blocks(css=CSS, title="Automated Letter System") as demo:
             preview_status = gr.Textbox(label="Preview Status", interactive=False, lines=2, visible=False)
         with gr.Row():
             data_preview = gr.Dataframe(label="Excel Preview (First 10 Rows)", visible=False, interactive=False)
+        with gr.Row():
+            workspace_box = gr.Textbox(label="Temporary Storage", interactive=False, lines=1)
+            workspace_btn = gr.Button("Refresh", elem_classes="small-btn")
     
         data_upload_btn.click(refresh_data,[data_upload],[data_dropdown, delete_dropdown, data_tpl, gen_tpl, data_preview, data_status])
         delete_btn.click(delete_data,[delete_dropdown],[data_dropdown, delete_dropdown, data_tpl, gen_tpl, data_status])
         data_dropdown.change(lambda f: (*preview_excel(f), gr.update(visible=True)),[data_dropdown],[data_preview, preview_status])
+        workspace_btn.click(workspace_usage, None, [workspace_box])
+        demo.load(workspace_usage, None, [workspace_box])
     
     with gr.Tab("Manage Templates"):
         gr.Markdown("### 📂 Template Manager\n\nUpload, view placeholders and delete data files.")
@@ -0,0 +1,112 @@
+"""Packaging rendered letters for download.
+
+.docx files are already zip-compressed, so the default "stored" mode just
+copies them into the archive. "deflate" recompresses at a chosen level, and
+a volume size splits big batches into several ZIPs plus a JSON manifest so
+each download stays manageable. "folder" skips archiving and leaves the
+letters in an output directory.
+"""
+
+import json, os, shutil, zipfile
+from typing import Dict, Iterable, List, Optional
+
+ARCHIVE_MODES = ["stored", "deflate", "folder"]
+
+# Rough per-entry overhead (local header + central directory) used when sizing volumes
+_ENTRY_OVERHEAD = 128
+
+def _open_zip(path: str, mode: str, level: Optional[int]) -> zipfile.ZipFile:
+    if mode == "deflate":
+        return zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED, compresslevel=level)
+    return zipfile.ZipFile(path, "w", zipfile.ZIP_STORED)
+
+def write_zip(files: Iterable[str], zip_path: str, mode: str = "stored", level: Optional[int] = None) -> str:
+    with _open_zip(zip_path, mode, level) as z:
+        for f in files:
+            z.write(f, arcname=os.path.basename(f))
+    return zip_path
+
+def write_volumes(files: Iterable[str], zip_path: str, volume_size: int, mode: str = "stored", level: Optional[int] = None) -> List[str]:
+    """Split files across ZIPs of at most `volume_size` bytes (a single larger file gets its own volume).
+
+    Volumes are named <name>.part01.zip, .part02.zip... next to `zip_path`,
+    followed by <name>.manifest.json listing which letter is in which volume.
+    Returns the volume paths and the manifest path.
+    """
+    stem = os.path.splitext(zip_path)[0]
+    volumes: List[Dict] = []
+    z, used = None, 0
+    for f in files:
+        size = os.path.getsize(f) + _ENTRY_OVERHEAD
+        if z is None or (used and used + size > volume_size):
+            if z is not None:
+                z.close()
+            path = f"{stem}.part{len(volumes) + 1:02d}.zip"
+            z, used = _open_zip(path, mode, level), 0
+            volumes.append({"volume": os.path.basename(path), "path": path, "files": []})
+        z.write(f, arcname=os.path.basename(f))
+        volumes[-1]["files"].append(os.path.basename(f))
+        used += size
+    if z is not None:
+        z.close()
+
+    for v in volumes:
+        v["bytes"] = os.path.getsize(v["path"])
+    manifest_path = f"{stem}.manifest.json"
+    with open(manifest_path, "w", encoding="utf-8") as m:
+        json.dump({
+            "total_files": sum(len(v["files"]) for v in volumes),
+            "volumes": [{k: v[k] for k in ("volume", "bytes", "files")} for v in volumes],
+        }, m, indent=2)
+    return [v["path"] for v in volumes] + [manifest_path]
+
+def export_folder(files: Iterable[str], out_dir: str) -> List[str]:
+    """Move rendered files into `out_dir` (no-op for files already there)."""
+    os.makedirs(out_dir, exist_ok=True)
+    moved = []
+    for f in files:
+        dest = os.path.join(out_dir, os.path.basename(f))
+        if os.path.abspath(f) != os.path.abspath(dest):
+            shutil.move(f, dest)
+        moved.append(dest)
+    return moved
+
+def package(
+    files: Iterable[str],
+    zip_path: str,
+    mode: str = "stored",
+    level: Optional[int] = None,
+    volume_size: int = 0,
+    out_dir: Optional[str] = None,
+) -> List[str]:
+    """Package rendered files according to `mode`. Returns the paths to hand to the user.
+
+    `files` may be a live iterator (e.g. PDFs still converting); it is
+    consumed once, as entries are written.
+
+    `out_dir` is required for "folder" mode; `volume_size` (bytes, 0 = no
+    limit) only applies to the ZIP modes.
+    """
+    if mode not in ARCHIVE_MODES:
+        raise ValueError(f"Unknown archive mode '{mode}' (expected one of {', '.join(ARCHIVE_MODES)})")
+    if mode == "folder":
+        if not out_dir:
+            raise ValueError("Folder mode needs an output directory")
+        return export_folder(files, out_dir)
+    if volume_size and volume_size > 0:
+        return write_volumes(files, zip_path, volume_size, mode, level)
+    return [write_zip(files, zip_path, mode, level)]
+
+def attach(paths: Optional[List[str]], files: List[str]) -> List[str]:
+    """Add extra files (e.g. a profile) to a packaged result.
+
+    They go into the last ZIP in `paths`; if there is no ZIP (merged
+    document, folder mode) they are returned as extra downloads instead.
+    """
+    zips = [p for p in paths or [] if p.endswith(".zip")]
+    if not zips:
+        return list(paths or []) + list(files)
+    with zipfile.ZipFile(zips[-1], "a") as z:
+        for f in files:
+            z.write(f, arcname=os.path.basename(f), compress_type=zipfile.ZIP_DEFLATED)
+    return list(paths)
@@ -0,0 +1,266 @@
+"""Headless batch generation (no Gradio, no Supabase).
+
+Renders the same letters as the 'Generate Letters' and 'Generate Viva Result
+Letters' tabs, straight from local files, so nightly batches can run from
+cron or a pipeline.
+
+    python batch.py letters offer.docx roster.xlsx --rename "Offer_{name}" --out letters.zip
+    python batch.py viva students.xlsx --templates-dir templates/ --out out_dir/ --workers 4
+
+`--out` ending in .zip writes an archive; anything else is used as a folder.
+`--archive deflate --level 6` recompresses (the default stores the already
+compressed .docx files as-is) and `--volume-size 500` splits the archive into
+500 MB volumes plus a manifest. `--merged` renders every row into one
+print-ready document instead (an --out ending in .docx implies it).
+`--pdf` converts the letters to PDF with a pool of headless LibreOffice
+workers (`--pdf-workers`) and packages the PDFs instead of the .docx files.
+`--check` only runs the pre-flight checks and exits non-zero on errors.
+
+Big runs can be split across machines: every node runs the same command
+with `--shard INDEX/COUNT` (0-based) and its own --out, then one merge
+combines them, checking that every row was rendered exactly once:
+
+    python batch.py letters offer.docx roster.xlsx --shard 0/4 --out shard0.zip   # ... through 3/4
+    python batch.py merge shard0.zip shard1.zip shard2.zip shard3.zip --out letters.zip
+
+The same entry points are importable:
+
+    from batch import batch_letters, batch_viva
+    files, errors = batch_letters("offer.docx", "roster.xlsx", "Offer_{name}", "letters.zip")
+"""
+
+import argparse, os, shutil, sys, tempfile, uuid
+from typing import List, Optional, Tuple
+
+from archive import package
+from letters import compile_template, iter_records, letter_jobs, merge_letters, run_jobs, viva_jobs
+from pdf import PDF_WORKERS, PdfPool, require_soffice
+from preflight import check_letters, check_viva
+from shards import ShardRun, merge_shards, parse_shard, write_manifest
+from uploads import file_sha256
+from rowstore import Dataset
+
+def _output_dir(out: str) -> Tuple[str, Optional[str]]:
+    """Return (folder to render into, zip path or None) for an --out value."""
+    if out.lower().endswith(".zip"):
+        os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+        return tempfile.mkdtemp(), out
+    if out.lower().endswith(".docx"):
+        out = os.path.dirname(os.path.abspath(out))
+    os.makedirs(out, exist_ok=True)
+    return out, None
+
+def _merged_name(out: str, prefix: str, merged: bool) -> Optional[str]:
+    if out.lower().endswith(".docx"):
+        return os.path.basename(out)
+    return f"{prefix}_merged.docx" if merged else None
+
+def _render(
+    jobs, errors: List[str], out_dir: str, workers: int, merged_name: Optional[str], pdf_workers: int = 0,
+) -> List[str]:
+    # Start the converters before rendering, so a missing LibreOffice fails before any work is done
+    pool = PdfPool(pdf_workers) if pdf_workers else None
+    try:
+        if merged_name:
+            path = os.path.join(out_dir, merged_name)
+            files = [path] if merge_letters(jobs, path, errors) else []
+        else:
+            files = run_jobs(jobs, workers, errors)
+        if pool and files:
+            pdfs = list(pool.convert(files, errors))
+            for f in files:
+                os.remove(f)
+            files = pdfs
+    finally:
+        if pool:
+            pool.close()
+    return files
+
+def _render_shard(
+    kind: str, make_jobs, data: str, shard: Tuple[int, int], errors: List[str], out_dir: str, workers: int, pdf_workers: int,
+) -> List[str]:
+    """Render only this shard's rows; the files plus the shard manifest."""
+    run = ShardRun(iter_records(data), shard[0], shard[1])
+    files = _render(run.jobs(make_jobs), errors, out_dir, workers, None, pdf_workers)
+    errors += run.skipped
+    return files + [write_manifest(run.manifest(kind, data, file_sha256(data), files), out_dir)]
+
+def _finish(
+    files: List[str], errors: List[str], out_dir: str, zip_path: Optional[str],
+    archive: str, level: Optional[int], volume_mb: float,
+) -> Tuple[List[str], List[str]]:
+    if zip_path:
+        if files:
+            files = package(files, zip_path, archive, level, int(volume_mb * 1024 * 1024))
+        shutil.rmtree(out_dir, ignore_errors=True)
+    return files, errors
+
+def batch_letters(
+    template: str,
+    data: str,
+    rename_pattern: Optional[str] = None,
+    out: Optional[str] = None,
+    workers: int = 1,
+    archive: str = "stored",
+    level: Optional[int] = None,
+    volume_mb: float = 0,
+    merged: bool = False,
+    pdf_workers: int = 0,
+    shard: Optional[Tuple[int, int]] = None,
+) -> Tuple[List[str], List[str]]:
+    """Render one letter per row of `data` with `template`.
+
+    Writes a ZIP (`archive` "stored" or "deflate", optionally split into
+    `volume_mb` volumes) when `out` ends in .zip, otherwise into the folder
+    `out`. With `merged` all letters go into one document; `pdf_workers` > 0
+    converts the output to PDF with that many LibreOffice workers. `shard`
+    (index, count) renders only that slice of the rows plus its manifest,
+    for `merge`. Returns (written files, errors).
+    """
+    _check_options(shard, merged, volume_mb, pdf_workers)
+    out = out or (f"letters_shard-{shard[0]}-of-{shard[1]}.zip" if shard else f"letters_{uuid.uuid4().hex[:6]}.zip")
+    out_dir, zip_path = _output_dir(out)
+    errors: List[str] = []
+    if shard:
+        make_jobs = lambda rows, taken, skipped: letter_jobs(template, rows, rename_pattern, out_dir, taken=taken)
+        files = _render_shard("letters", make_jobs, data, shard, errors, out_dir, workers, pdf_workers)
+    else:
+        jobs = letter_jobs(template, iter_records(data), rename_pattern, out_dir)
+        files = _render(jobs, errors, out_dir, workers, _merged_name(out, "letters", merged), pdf_workers)
+    return _finish(files, errors, out_dir, zip_path, archive, level, volume_mb)
+
+def batch_viva(
+    data: str,
+    templates_dir: str,
+    rename_prefix: Optional[str] = None,
+    out: Optional[str] = None,
+    workers: int = 1,
+    archive: str = "stored",
+    level: Optional[int] = None,
+    volume_mb: float = 0,
+    merged: bool = False,
+    pdf_workers: int = 0,
+    shard: Optional[Tuple[int, int]] = None,
+) -> Tuple[List[str], List[str]]:
+    """Render viva letters, matching each row's 'template' column against .docx files in `templates_dir`."""
+    _check_options(shard, merged, volume_mb, pdf_workers)
+    out = out or (f"viva_letters_shard-{shard[0]}-of-{shard[1]}.zip" if shard else f"viva_letters_{uuid.uuid4().hex[:6]}.zip")
+    out_dir, zip_path = _output_dir(out)
+    template_names = sorted(f for f in os.listdir(templates_dir) if f.lower().endswith(".docx"))
+    errors: List[str] = []
+    make_jobs = lambda rows, taken=None, skipped=errors: viva_jobs(
+        rows, template_names, lambda f: os.path.join(templates_dir, f), rename_prefix, out_dir, skipped, taken
+    )
+    if shard:
+        files = _render_shard("viva", make_jobs, data, shard, errors, out_dir, workers, pdf_workers)
+    else:
+        files = _render(make_jobs(iter_records(data)), errors, out_dir, workers, _merged_name(out, "viva_letters", merged), pdf_workers)
+    return _finish(files, errors, out_dir, zip_path, archive, level, volume_mb)
+
+def _check_options(shard: Optional[Tuple[int, int]], merged: bool, volume_mb: float, pdf_workers: int) -> None:
+    """Reject bad option combinations before any output folder is created."""
+    if pdf_workers:
+        require_soffice()
+    if shard and merged:
+        raise ValueError("--merged can't be combined with --shard; merge the shards first")
+    if shard and volume_mb:
+        raise ValueError("--volume-size can't be combined with --shard; pass it to merge instead")
+
+def check(command: str, data: str, template: Optional[str] = None, templates_dir: Optional[str] = None):
+    """Run the pre-flight checks for a batch without rendering. Returns a PreflightReport."""
+    ds = Dataset.from_records(iter_records(data))
+    if command == "letters":
+        placeholders = compile_template(template).placeholders if os.path.exists(template) else None
+        return check_letters(placeholders, ds, template=os.path.basename(template))
+    names = sorted(f for f in os.listdir(templates_dir) if f.lower().endswith(".docx"))
+    return check_viva(ds, names, lambda f: compile_template(os.path.join(templates_dir, f)).placeholders)
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="batch.py", description="Generate letters without the web UI.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("letters", help="one template for every row")
+    p.add_argument("template", help=".docx template")
+    p.add_argument("data", help=".csv or .xlsx data file")
+
+    v = sub.add_parser("viva", help="per-row template from the 'template' column")
+    v.add_argument("data", help=".csv or .xlsx student file")
+    v.add_argument("--templates-dir", required=True, help="folder holding the .docx templates")
+
+    m = sub.add_parser("merge", help="combine --shard outputs into one archive")
+    m.add_argument("shards", nargs="+", help="shard output .zip files or folders")
+    m.add_argument("--out", required=True, help="output .zip or folder")
+    m.add_argument("--archive", choices=["stored", "deflate"], default="stored", help="ZIP entry compression (default stored)")
+    m.add_argument("--level", type=int, choices=range(10), default=None, metavar="0-9", help="deflate level")
+    m.add_argument("--volume-size", type=float, default=0, help="split the ZIP into volumes of this many MB")
+    m.add_argument("--force", action="store_true", help="write the archive even if rows are missing or duplicated")
+
+    for s in (p, v):
+        s.add_argument("--rename", default=None, help="file name pattern, e.g. Letter_{name}")
+        s.add_argument("--out", default=None, help="output .zip or folder (default: new ZIP in cwd)")
+        s.add_argument("--workers", type=int, default=1, help="render processes (default 1)")
+        s.add_argument("--archive", choices=["stored", "deflate"], default="stored", help="ZIP entry compression (default stored)")
+        s.add_argument("--level", type=int, choices=range(10), default=None, metavar="0-9", help="deflate level")
+        s.add_argument("--volume-size", type=float, default=0, help="split the ZIP into volumes of this many MB")
+        s.add_argument("--merged", action="store_true", help="one document with a page break between letters")
+        s.add_argument("--check", action="store_true", help="only run pre-flight checks on the data")
+        s.add_argument("--pdf", action="store_true", help="convert the output to PDF (needs LibreOffice)")
+        s.add_argument("--pdf-workers", type=int, default=PDF_WORKERS, help=f"LibreOffice workers for --pdf (default {PDF_WORKERS})")
+        s.add_argument("--shard", type=_shard_arg, default=None, metavar="INDEX/COUNT", help="render only rows r with r %% COUNT == INDEX, plus a manifest for merge")
+    return parser
+
+def _shard_arg(spec: str) -> Tuple[int, int]:
+    try:
+        return parse_shard(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def _merge(args) -> int:
+    files, errors, warnings = merge_shards(args.shards, args.out, args.archive, args.level, args.volume_size, args.force)
+    for w in warnings:
+        print(f"⚠️ {w}", file=sys.stderr)
+    for e in errors:
+        print(f"❌ {e}", file=sys.stderr)
+    if errors and not args.force:
+        print("❌ Shards are incomplete or inconsistent; nothing written (use --force to write anyway).", file=sys.stderr)
+        return 1
+    if not files:
+        print("❌ No letters in the shards.", file=sys.stderr)
+        return 1
+    print(f"✅ Merged {len(args.shards)} shards into {', '.join(files) if len(files) < 4 else f'{len(files)} files'}")
+    return 0
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command == "merge":
+        return _merge(args)
+    if args.check:
+        report = check(args.command, args.data, getattr(args, "template", None), getattr(args, "templates_dir", None))
+        print(report.summary())
+        return 0 if report.ok else 1
+
+    try:
+        if args.command == "letters":
+            files, errors = batch_letters(
+                args.template, args.data, args.rename, args.out, args.workers, args.archive, args.level, args.volume_size, args.merged,
+                args.pdf_workers if args.pdf else 0, args.shard,
+            )
+        else:
+            files, errors = batch_viva(
+                args.data, args.templates_dir, args.rename, args.out, args.workers, args.archive, args.level, args.volume_size, args.merged,
+                args.pdf_workers if args.pdf else 0, args.shard,
+            )
+    except (RuntimeError, ValueError) as e:  # e.g. --pdf without LibreOffice
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+
+    for e in errors:
+        print(f"⚠️ {e}", file=sys.stderr)
+    if not files:
+        print("❌ No letters generated.", file=sys.stderr)
+        return 1
+    print(f"✅ Wrote {', '.join(files) if len(files) < 4 else f'{len(files)} files'}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
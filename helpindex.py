@@ -0,0 +1,221 @@
+"""Retrieval for the help chatbot: BM25 over the FAQ and the user manual.
+
+The index is built once at startup. Each FAQ answer is one document titled
+by its key, and the manual PDF is split into short passages titled by
+their page's headings. Queries are tokenized the same way and scored with
+BM25 over the text, plus a bonus for words found in the title (a larger
+one for FAQ keys, which are curated topic names). Words
+missing from the vocabulary are matched to known words within one or two
+edits, using a deletion-neighbourhood lookup (SymSpell-style), so
+"plcaeholder" still finds "placeholder". A query takes well under a
+millisecond and needs no model.
+
+Reading the manual needs `pypdf`; without it only the FAQ is indexed.
+"""
+
+import math, re
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+TITLE_BOOST = 2.0  # extra idf-weighted score per query word found in a manual passage's headings
+FAQ_KEY_BOOST = 4.0  # the same for an FAQ key, with idf floored at 1 so common words like "template" still count
+FAQ_BOOST = 1.2  # prefer the curated answers when the manual scores about the same
+FUZZY_WEIGHT = 0.7  # score factor for a typo-corrected word
+PASSAGE_WORDS = 45
+
+_TOKEN = re.compile(r"[a-z0-9_]+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "how", "i", "if",
+    "in", "is", "it", "me", "my", "of", "on", "or", "the", "this", "to", "what", "when", "where", "which",
+    "why", "with", "you", "your", "should", "would", "could", "will", "please", "there", "get", "want", "need",
+    "apa", "bagaimana", "saya", "untuk", "dan", "di", "ke", "yang", "ini", "itu",
+}
+
+def _stem(word: str) -> str:
+    for suffix in ("ing", "ed", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3 and not word.endswith("ss"):
+            return word[: -len(suffix)]
+    return word
+
+def tokenize(text: str) -> List[str]:
+    return [_stem(t) for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+def _deletes(word: str, depth: int) -> Set[str]:
+    out, frontier = set(), {word}
+    for _ in range(depth):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w)) if len(w) > 1}
+        out |= frontier
+    return out
+
+def _max_edits(word: str) -> int:
+    return 0 if len(word) < 4 else 1 if len(word) < 8 else 2
+
+def _within(a: str, b: str, limit: int) -> bool:
+    """Optimal-string-alignment distance(a, b) <= limit (typos incl. swapped letters)."""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    prev2, prev = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > limit:
+            return False
+        prev2, prev = prev, cur
+    return prev[-1] <= limit
+
+class HelpDoc(NamedTuple):
+    text: str
+    source: str  # "faq" or "manual"
+    page: int = 0
+
+class Hit(NamedTuple):
+    doc: HelpDoc
+    score: float
+
+class HelpIndex:
+    def __init__(self, docs: Iterable[Tuple[HelpDoc, str]]):
+        """`docs` pairs each document with its title (FAQ key or manual headings)."""
+        self.docs: List[HelpDoc] = []
+        self._lengths: List[int] = []
+        self._titles: List[Set[str]] = []
+        self._postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        for doc, title in docs:
+            tokens = tokenize(doc.text)
+            doc_id = len(self.docs)
+            self.docs.append(doc)
+            self._lengths.append(len(tokens))
+            self._titles.append(set(tokenize(title)))
+            for term, tf in Counter(tokens + list(self._titles[-1] - set(tokens))).items():
+                self._postings[term].append((doc_id, tf))
+        n = len(self.docs)
+        self._avg_len = (sum(self._lengths) / n) if n else 0.0
+        self._idf = {t: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for t, p in self._postings.items()}
+        self._neighbours: Dict[str, Set[str]] = defaultdict(set)
+        for term in self._postings:
+            for d in _deletes(term, _max_edits(term)):
+                self._neighbours[d].add(term)
+
+    def _expand(self, token: str) -> List[Tuple[str, float]]:
+        """The token itself if indexed, else indexed words within its edit budget."""
+        if token in self._postings:
+            return [(token, 1.0)]
+        limit = _max_edits(token)
+        if not limit:
+            return []
+        candidates = set(self._neighbours.get(token, ()))
+        for d in _deletes(token, limit):
+            if d in self._postings:
+                candidates.add(d)
+            candidates |= self._neighbours.get(d, set())
+        return [(t, FUZZY_WEIGHT) for t in candidates if _within(token, t, limit)]
+
+    def search(self, query: str, limit: int = 3) -> List[Hit]:
+        scores: Dict[int, float] = defaultdict(float)
+        for token in set(tokenize(query)):
+            for term, weight in self._expand(token):
+                idf = self._idf[term]
+                for doc_id, tf in self._postings[term]:
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[doc_id] / self._avg_len)
+                    scores[doc_id] += weight * idf * tf * (BM25_K1 + 1) / (tf + norm)
+                    if term in self._titles[doc_id]:
+                        faq = self.docs[doc_id].source == "faq"
+                        scores[doc_id] += weight * (FAQ_KEY_BOOST * max(idf, 1.0) if faq else TITLE_BOOST * idf)
+        for doc_id in scores:
+            if self.docs[doc_id].source == "faq":
+                scores[doc_id] *= FAQ_BOOST
+        best = sorted(scores.items(), key=lambda kv: -kv[1])[:limit]
+        return [Hit(self.docs[d], s) for d, s in best]
+
+    def answer(self, query: str) -> Optional[str]:
+        hits = self.search(query, limit=1)
+        if not hits:
+            return None
+        doc = hits[0].doc
+        if doc.source == "manual":
+            return f"📘 From the user manual (page {doc.page}):\n{doc.text}"
+        return doc.text
+
+# -------------------------
+# Building
+# -------------------------
+_STEP = re.compile(r"^(\d+\.|\*|•)")
+_SMALL_WORDS = {"a", "and", "for", "in", "of", "on", "the", "to"}
+
+def _is_subheading(line: str, previous: Optional[str]) -> bool:
+    """Short Title Case lines after a finished sentence, e.g. "Letters Not Generated"."""
+    words = line.split()
+    return (
+        2 <= len(words) <= 6 and previous is not None and previous.endswith(".")
+        and all(w[0].isupper() or w in _SMALL_WORDS for w in words)
+    )
+
+def _logical_lines(page_text: str) -> List[str]:
+    """Re-join the manual's wrapped lines; drop the bare figure numbers between them."""
+    lines: List[str] = []
+    last_text: Optional[str] = None  # previous line that isn't an upper-case title
+    heading = False
+    for raw in page_text.splitlines():
+        line = raw.strip()
+        if not line or line.isdigit():
+            continue
+        if lines and line.isupper() and line.endswith("."):  # tail of a wrapped sentence, e.g. ".DOCX."
+            lines[-1] = f"{lines[-1]} {line}"
+            continue
+        joinable = lines and not heading and not _STEP.match(line) and not lines[-1].endswith((".", ":"))
+        if joinable and not lines[-1].isupper() and not line.isupper():
+            lines[-1] = last_text = f"{lines[-1]} {line}"
+            continue
+        if not line.isupper():
+            heading = _is_subheading(line, last_text)
+            last_text = line
+        lines.append(line)
+    return lines
+
+def _starts_section(line: str, previous: Optional[str]) -> bool:
+    return line.endswith(":") and len(line.split()) <= 3 or _is_subheading(line, previous)
+
+def manual_passages(path: str, words: int = PASSAGE_WORDS) -> List[Tuple[HelpDoc, str]]:
+    """Split the manual into passages of about `words` words, titled with their page's headings."""
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        print("⚠️ pypdf not installed; the chatbot will only use the FAQ")
+        return []
+    try:
+        pages = [p.extract_text() or "" for p in PdfReader(path).pages]
+    except Exception as e:
+        print(f"⚠️ Could not read the user manual for the chatbot: {e}")
+        return []
+
+    out = []
+    for number, text in enumerate(pages, 1):
+        lines = _logical_lines(text)
+        # Short upper-case lines are section titles; long ones are page blurbs
+        title = " ".join(l for l in lines if l.isupper() and len(l.split()) <= 5)
+        body = [l for l in lines if not l.isupper()]
+        chunks: List[List[str]] = []
+        for i, line in enumerate(body):
+            if not chunks or _starts_section(line, body[i - 1] if i else None) or sum(len(c.split()) for c in chunks[-1]) >= words:
+                chunks.append([])
+            chunks[-1].append(line)
+        out += [(HelpDoc("\n".join(c), "manual", number), title) for c in chunks]
+    return out
+
+def build_help_index(faq: Dict[str, str], manual_path: Optional[str] = None) -> HelpIndex:
+    docs = [(HelpDoc(answer, "faq"), key) for key, answer in faq.items()]
+    if manual_path:
+        docs += manual_passages(manual_path)
+    return HelpIndex(docs)
+
+def check_answers(index: HelpIndex, faq: Dict[str, str], expected: Dict[str, str]) -> List[str]:
+    """Queries in `expected` (query -> FAQ key) whose answer isn't that FAQ entry."""
+    return [
+        f"'{query}' answered with {(index.answer(query) or 'nothing')[:40]!r}, expected the '{key}' FAQ"
+        for query, key in expected.items() if index.answer(query) != faq[key]
+    ]
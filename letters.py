@@ -0,0 +1,506 @@
+"""Letter rendering core.
+
+Everything needed to turn a .docx template plus rows of data into letters,
+with no Gradio or Supabase imports. app.py (the web UI) and batch.py (the
+headless CLI / Python API) both render through these functions.
+"""
+
+import os, re, uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from io import BytesIO, StringIO
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+from docx import Document
+from docx.enum.text import WD_BREAK
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.opc.packuri import PackURI
+from docx.opc.part import Part
+from docx.oxml.ns import qn
+from docx.shared import Inches
+
+from rowstore import Dataset
+
+# -------------------------
+# Formatting helpers
+# -------------------------
+def format_date(value) -> str:
+    """Format a date the way every letter shows it, e.g. '14 October 2025'."""
+    return value.strftime("%#d %B %Y") if os.name == "nt" else value.strftime("%-d %B %Y")
+
+def normalize_column(name) -> str:
+    """Lowercase a column header and replace spaces with underscores."""
+    return str(name).strip().lower().replace(" ", "_")
+
+def format_cell(x) -> str:
+    if pd.isna(x):
+        return ""
+    if isinstance(x, (datetime, pd.Timestamp)):
+        return format_date(x)
+    return str(x).strip()
+
+def sanitize_filename(name: str) -> str:
+    return re.sub(r"[\\/*?<>|:\"\n\r\t]+", "_", name.strip())[:200]
+
+# -------------------------
+# Data parsing
+# -------------------------
+def _excel_value(x) -> str:
+    # Match what pandas.read_excel + format_cell produce for openpyxl cell values
+    if x is None:
+        return ""
+    if isinstance(x, float) and x.is_integer():
+        x = int(x)
+    return format_cell(x)
+
+def _header(names) -> List[str]:
+    cols, seen = [], {}
+    for i, c in enumerate(names):
+        col = normalize_column(c if c is not None and str(c).strip() else f"Unnamed: {i}")
+        if col in seen:
+            seen[col] += 1
+            col = f"{col}.{seen[col]}"
+        else:
+            seen[col] = 0
+        cols.append(col)
+    return cols
+
+def iter_records(source, ext: Optional[str] = None, chunksize: int = 5000) -> Iterator[Dict[str, str]]:
+    """Stream normalized rows from a CSV/XLSX path or file-like object.
+
+    CSV is read in chunks of `chunksize` rows and XLSX through a read-only
+    openpyxl sheet, so only one chunk is in memory at a time. Column names are
+    normalized like everywhere else and every value comes out as a string.
+    """
+    if ext is None:
+        ext = os.path.splitext(str(source))[1]
+    if ext.lower() == ".csv":
+        for chunk in pd.read_csv(source, dtype=str, keep_default_na=False, chunksize=chunksize):
+            chunk.columns = _header(chunk.columns)
+            for values in chunk.itertuples(index=False, name=None):
+                yield dict(zip(chunk.columns, (v.strip() for v in values)))
+        return
+
+    from openpyxl import load_workbook
+    wb = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        cols = _header(header)
+        for values in rows:
+            if all(v is None for v in values):
+                continue
+            record = dict.fromkeys(cols, "")
+            record.update(zip(cols, map(_excel_value, values)))
+            yield record
+    finally:
+        wb.close()
+
+_KEY_VALUE = re.compile(r"^\s*[^,;:\t]+:")
+
+def detect_delimiter(text: str) -> Optional[str]:
+    """The separator of a pasted table with a header row ("\t", "," or ";").
+
+    None means `text` is in the `key: value, key: value` line format (or is a
+    single line, which can't be a header plus data).
+    """
+    lines = [l for l in text.splitlines() if l.strip()]
+    if len(lines) < 2 or _KEY_VALUE.match(lines[0]):
+        return None
+    head = lines[0]
+    if "\t" in head:
+        return "\t"
+    return ";" if ";" in head and "," not in head else ","
+
+def parse_table(text: str, sep: str) -> Dataset:
+    """Parse a pasted TSV/CSV table (header row first) in one pass.
+
+    Headers and values are normalized exactly as `iter_records` does for
+    uploaded files; each column is then stripped and factorized as a whole,
+    so large pastes load as fast as files. Raises ValueError on malformed
+    input (e.g. a row with more cells than the header).
+    """
+    try:
+        # header=None so a data row wider than the header is an error, not an implicit index
+        df = pd.read_csv(StringIO(text), sep=sep, header=None, dtype=str, keep_default_na=False, skip_blank_lines=True)
+    except (pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+        raise ValueError(str(e).strip()) from None
+    df.columns = _header(df.iloc[0])
+    df = df.iloc[1:].fillna("").apply(lambda col: col.str.strip())
+    df = df[(df != "").any(axis=1)]  # rows that were only separators
+    columns = {}
+    for name in df.columns:
+        codes, values = pd.factorize(df[name], sort=False)
+        columns[name] = (values.tolist(), codes.tolist())
+    return Dataset.from_columns(columns)
+
+# -------------------------
+# Templates
+# -------------------------
+class CompiledTemplate:
+    """A .docx template read from disk once and reused for every row."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+        with open(path, "rb") as f:
+            self.data = f.read()
+        self._placeholders: Optional[List[str]] = None
+
+    def new_document(self) -> Document:
+        return Document(BytesIO(self.data))
+
+    @property
+    def placeholders(self) -> List[str]:
+        if self._placeholders is None:
+            self._placeholders = placeholders_in(self.new_document())
+        return self._placeholders
+
+_COMPILED: "OrderedDict[str, Tuple[Tuple[int, int], CompiledTemplate]]" = OrderedDict()
+COMPILED_CACHE_SIZE = 64  # templates are downloaded to fresh paths, so keep the cache bounded
+
+def compile_template(path: str) -> CompiledTemplate:
+    """Return the compiled template for `path`, re-reading it only when the file changes."""
+    key = os.path.abspath(path)
+    st = os.stat(key)
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _COMPILED.get(key)
+    if cached and cached[0] == stamp:
+        _COMPILED.move_to_end(key)
+        return cached[1]
+    tpl = CompiledTemplate(key)
+    _COMPILED[key] = (stamp, tpl)
+    while len(_COMPILED) > COMPILED_CACHE_SIZE:
+        _COMPILED.popitem(last=False)
+    return tpl
+
+def placeholders_in(doc: Document) -> List[str]:
+    text = " ".join(p.text for p in doc.paragraphs)
+    for table in doc.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                text += " " + " ".join(p.text for p in cell.paragraphs)
+    matches = re.findall(r"\{\{(.*?)\}\}|\{(.*?)\}", text)
+    return list({(m[0] or m[1]).strip() for m in matches if (m[0] or m[1]).strip()})
+
+def resolve_template(choice: str, filenames: Iterable[str]) -> Optional[str]:
+    """Find the template whose filename contains `choice` (case-insensitive)."""
+    choice = choice.strip().lower()
+    return next((f for f in filenames if choice in f.lower()), None)
+
+# -------------------------
+# Rendering
+# -------------------------
+def replace_placeholders(doc: Document, fields: Dict[str, str]) -> Document:
+    def process_paragraph(par):
+        for run in par.runs:
+            text = run.text
+            for k, v in fields.items():
+                # --- Handle image placeholders ---
+                if k.endswith("image") and v and os.path.exists(v):
+                    if f"{{{k}}}" in text or f"{{{{{k}}}}}" in text:
+                        run.text = text.replace(f"{{{k}}}", "").replace(f"{{{{{k}}}}}", "")
+                        new_run = par.add_run()
+                        new_run.add_picture(v, width=Inches(1.5))
+                        text = run.text
+
+                # --- Handle text placeholders ---
+                else:
+                    if f"{{{k}}}" in text or f"{{{{{k}}}}}" in text or f"{{{k.upper()}}}" in text:
+                        val = str(v)
+                        run.text = (
+                            text.replace(f"{{{k}}}", val)
+                                .replace(f"{{{{{k}}}}}", val)
+                                .replace(f"{{{k.upper()}}}", val.upper())  # {NAME} → upper-cased value
+                        )
+                        text = run.text  # later keys replace into the updated run
+
+    for p in doc.paragraphs:
+        process_paragraph(p)
+    for table in doc.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                for p in cell.paragraphs:
+                    process_paragraph(p)
+    return doc
+
+def render_document(template: CompiledTemplate, fields: Dict[str, str]) -> Document:
+    """Fill a fresh copy of the template with one row of data."""
+    # Normalize field keys to lowercase before replacement
+    lower_fields = {k.lower(): v for k, v in fields.items()}
+    return replace_placeholders(template.new_document(), lower_fields)
+
+def letter_filename(template_name: str, fields: Dict[str, str], rename_pattern: Optional[str]) -> str:
+    """Output name (without extension) for a 'Generate Letters' row."""
+    base = os.path.splitext(template_name)[0]
+    if rename_pattern:
+        name = rename_pattern
+        # Make matching case-insensitive
+        for k, v in fields.items():
+            pattern = re.compile(rf"\{{{{\s*{re.escape(k)}\s*\}}}}|\{{\s*{re.escape(k)}\s*\}}", re.IGNORECASE)
+            name = pattern.sub(str(v), name)
+        return sanitize_filename(name) or f"{base}_{uuid.uuid4().hex[:6]}"
+    return f"{base}_{fields.get('name', uuid.uuid4().hex[:6])}"
+
+def unique_path(out_dir: str, name: str, taken: set, ext: str = ".docx") -> str:
+    """Join `name` onto `out_dir`, adding _2, _3... if the name was already used."""
+    candidate, n = name, 1
+    while candidate.lower() in taken:
+        n += 1
+        candidate = f"{name}_{n}"
+    taken.add(candidate.lower())
+    return os.path.join(out_dir, f"{candidate}{ext}")
+
+def render_letter(template: CompiledTemplate, fields: Dict[str, str], rename_pattern: Optional[str], out_dir: str) -> str:
+    doc = render_document(template, fields)
+    out_path = os.path.join(out_dir, f"{letter_filename(template.name, fields, rename_pattern)}.docx")
+    doc.save(out_path)
+    return out_path
+
+# -------------------------
+# Viva records
+# -------------------------
+def prepare_viva_record(student: Dict) -> Tuple[Optional[Dict[str, str]], Optional[str]]:
+    """Normalize one viva row. Returns (fields, None) or (None, error)."""
+    s = {k.lower(): str(v).strip() for k, v in student.items() if v is not None}
+    name = s.get("name", s.get("nama", "")).strip()
+    tpl_choice = s.get("template", "").strip()
+    program_val = s.get("program", "").strip()
+    degree_val = s.get("degree", "").strip() or s.get("jenis_degree", "").strip()
+
+    # --- Handle date ---
+    date_raw = s.get("tarikh_viva", s.get("date", "")).strip()
+    if not date_raw:
+        date_val = datetime.now()
+    else:
+        try:
+            date_val = pd.to_datetime(date_raw, errors="coerce")
+            if pd.isna(date_val):
+                date_val = datetime.now()
+        except Exception:
+            date_val = datetime.now()
+    date_val = format_date(date_val)
+
+    if not name:
+        return None, "Missing student name."
+    if not tpl_choice:
+        return None, f"No template selected for {name}."
+
+    # --- Fill placeholders ---
+    s["name"] = name
+    s["nama"] = name
+    s["template"] = tpl_choice
+    s["program"] = program_val
+    s["degree"] = degree_val
+    s["jenis_degree"] = degree_val  # ✅ now matches Degree dropdown, not Program
+    s["tarikh_submit"] = date_val
+    s["tarikh"] = date_val
+    return s, None
+
+def viva_filename(template_name: str, fields: Dict[str, str], rename_prefix: Optional[str]) -> str:
+    """Output name (without extension) for a viva letter."""
+    if rename_prefix and rename_prefix.strip():
+        rename_pattern = rename_prefix
+        for key, val in fields.items():
+            rename_pattern = rename_pattern.replace(f"{{{key}}}", val)
+            rename_pattern = rename_pattern.replace(f"{{{key.upper()}}}", val.upper())
+    else:
+        rename_pattern = os.path.splitext(template_name)[0]
+    return re.sub(r"[^\w\s-]", "", rename_pattern).strip().replace(" ", "_")
+
+# -------------------------
+# Batch generation
+# -------------------------
+# A job is (template_path, fields, out_path); workers compile each template once per process.
+Job = Tuple[str, Dict[str, str], str]
+
+def _render_job(job: Job) -> Tuple[str, Optional[str]]:
+    tpl_path, fields, out_path = job
+    try:
+        render_document(compile_template(tpl_path), fields).save(out_path)
+        return out_path, None
+    except Exception as e:
+        return out_path, str(e)
+
+def render_jobs(jobs: Iterable[Job], workers: int = 1, chunksize: int = 16) -> Iterator[Tuple[str, Optional[str]]]:
+    """Render jobs in order, inline or across `workers` processes. Yields (out_path, error)."""
+    if workers <= 1:
+        for job in jobs:
+            yield _render_job(job)
+        return
+    # Executor.map submits everything up front, so feed it a bounded window at a
+    # time to keep streamed row sources from piling up in memory.
+    window = workers * chunksize * 4
+    jobs = iter(jobs)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            batch = list(islice(jobs, window))
+            if not batch:
+                break
+            yield from pool.map(_render_job, batch, chunksize=chunksize)
+
+def letter_jobs(
+    template_path: str,
+    rows: Iterable[Dict[str, str]],
+    rename_pattern: Optional[str],
+    out_dir: str,
+    template_name: Optional[str] = None,
+    taken: Optional[set] = None,
+) -> Iterator[Job]:
+    """One job per row, all using the same template. `taken` holds output names already in use."""
+    template_name = template_name or os.path.basename(template_path)
+    taken = set() if taken is None else taken
+    for row in rows:
+        row = dict(row)
+        name = letter_filename(template_name, row, rename_pattern)
+        yield template_path, row, unique_path(out_dir, name, taken)
+
+def viva_jobs(
+    students: Iterable[Dict],
+    template_names: List[str],
+    fetch_template: Callable[[str], Optional[str]],
+    rename_prefix: Optional[str],
+    out_dir: str,
+    errors: List[str],
+    taken: Optional[set] = None,
+) -> Iterator[Job]:
+    """One job per valid student, using the template named in its 'template' field.
+
+    `fetch_template` maps a template filename to a local path and is called
+    once per distinct template. Skipped rows are reported into `errors`.
+    """
+    fetched: Dict[str, Optional[str]] = {}
+    taken = set() if taken is None else taken
+    for student in students:
+        s, err = prepare_viva_record(student)
+        if err:
+            errors.append(err)
+            continue
+
+        # --- Locate template ---
+        tpl_file = resolve_template(s["template"], template_names)
+        if not tpl_file:
+            errors.append(f"Template '{s['template']}' not found.")
+            continue
+        if tpl_file not in fetched:
+            fetched[tpl_file] = fetch_template(tpl_file)
+        tpl_path = fetched[tpl_file]
+        if not tpl_path or not os.path.exists(tpl_path):
+            errors.append(f"❌ Failed to download template {tpl_file} from database")
+            continue
+
+        name = viva_filename(tpl_file, s, rename_prefix)
+        yield tpl_path, s, unique_path(out_dir, name, taken)
+
+def run_jobs(jobs: Iterable[Job], workers: int, errors: List[str]) -> List[str]:
+    """Render jobs to disk. Returns the files written; failures go into `errors`."""
+    files = []
+    for out_path, err in render_jobs(jobs, workers):
+        if err:
+            errors.append(f"{os.path.basename(out_path)}: {err}")
+        else:
+            files.append(out_path)
+    return files
+
+# -------------------------
+# Merged output
+# -------------------------
+_R_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+
+class MergedDocument:
+    """Many letters appended into one .docx, separated by page breaks.
+
+    The first letter's template supplies styles, numbering, page setup,
+    headers and footers, so every letter must come from the same template.
+    Each further letter is rendered in memory and its body elements are
+    moved across, so nothing is re-read from disk.
+    """
+
+    def __init__(self):
+        self.doc: Optional[Document] = None
+        self.count = 0
+
+    def append(self, letter: Document) -> None:
+        if self.doc is None:
+            self.doc = letter
+            self.count = 1
+            return
+        body = self.doc.element.body
+        sect = body.sectPr
+        self.doc.add_paragraph().add_run().add_break(WD_BREAK.PAGE)
+        relinked: Dict[str, str] = {}
+        for el in list(letter.element.body.iterchildren()):
+            if el.tag == qn("w:sectPr"):
+                continue
+            self._relink(letter, el, relinked)
+            if sect is not None:
+                sect.addprevious(el)
+            else:
+                body.append(el)
+        self.count += 1
+
+    def _relink(self, letter: Document, el, relinked: Dict[str, str]) -> None:
+        # Every r:id / r:embed / r:link must name a relationship of the merged
+        # document: links are re-added, pictures and other parts copied across.
+        for node in el.iter():
+            for attr, rid in node.attrib.items():
+                if attr.startswith(_R_NS) and rid in letter.part.rels:
+                    if rid not in relinked:
+                        relinked[rid] = self._copy_rel(letter.part.rels[rid])
+                    node.set(attr, relinked[rid])
+
+    def _copy_rel(self, rel) -> str:
+        dst = self.doc.part
+        if rel.is_external:
+            return dst.relate_to(rel.target_ref, rel.reltype, is_external=True)
+        if rel.reltype == RT.IMAGE:
+            return dst.get_or_add_image(BytesIO(rel.target_part.blob))[0]
+        taken = {str(p.partname) for p in dst.package.iter_parts()}
+        return dst.relate_to(self._copy_part(rel.target_part, taken, {}), rel.reltype)
+
+    def _copy_part(self, part: Part, taken: set, copied: Dict[int, Part]) -> Part:
+        """A copy of `part` (and the parts it relates to) under unused names in the merged package."""
+        if id(part) in copied:
+            return copied[id(part)]
+        base, ext = os.path.splitext(re.sub(r"\d+(\.\w+)$", r"\1", str(part.partname)))
+        n = 1
+        while f"{base}{n}{ext}" in taken:
+            n += 1
+        taken.add(f"{base}{n}{ext}")
+        new = copied[id(part)] = Part(PackURI(f"{base}{n}{ext}"), part.content_type, part.blob, self.doc.part.package)
+        for rid, rel in part.rels.items():  # same ids, so the copied blob's references still resolve
+            target = rel.target_ref if rel.is_external else self._copy_part(rel.target_part, taken, copied)
+            new.rels.add_relationship(rel.reltype, target, rid, rel.is_external)
+        return new
+
+    def save(self, path: str) -> str:
+        self.doc.save(path)
+        return path
+
+def merge_letters(jobs: Iterable[Job], out_path: str, errors: List[str]) -> int:
+    """Render every job straight into one document at `out_path`. Returns how many letters it holds.
+
+    Raises ValueError if the jobs use more than one template.
+    """
+    merged = MergedDocument()
+    first_template = None
+    for tpl_path, fields, name in jobs:
+        first_template = first_template or tpl_path
+        if os.path.abspath(tpl_path) != os.path.abspath(first_template):
+            raise ValueError(
+                f"One merged document needs every letter to use the same template (found "
+                f"{os.path.basename(first_template)} and {os.path.basename(tpl_path)}). "
+                "Choose separate letters or PDF instead."
+            )
+        try:
+            merged.append(render_document(compile_template(tpl_path), fields))
+        except Exception as e:
+            errors.append(f"{os.path.basename(name)}: {e}")
+    if merged.count:
+        merged.save(out_path)
+    return merged.count
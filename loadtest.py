@@ -0,0 +1,255 @@
+"""Concurrent-user load test for the letter app.
+
+Simulates N staff sessions, each repeating the same scenario:
+
+    load_file -> gen_sample -> gen_all -> load_saved_excel -> bulk_assign -> generate_viva_letters
+
+Storage is the local stand-in (localstore.py), seeded with a generated
+template and a roster built from a fixed random seed, so the same options
+always render the same data. Reports throughput, latency percentiles per
+endpoint and the memory high-water mark.
+
+In-process (imports app.py with LETTER_LOCAL_STORAGE set):
+
+    python loadtest.py --sessions 8 --rounds 3 --rows 200 --out report.json
+
+Against a running app (start it with LETTER_LOCAL_STORAGE=<dir>, pass the same --store):
+
+    python loadtest.py --url http://127.0.0.1:7860 --store /tmp/lt_store --server-pid 1234
+"""
+
+import argparse, json, math, os, platform, random, sys, tempfile, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+TEMPLATE_NAME = "loadtest_letter.docx"
+LETTERS_DATA = "loadtest_roster.xlsx"
+VIVA_DATA = "loadtest_viva.xlsx"
+FIRST = ["Ali", "Siti", "Ahmad", "Nurul", "Farah", "Hafiz", "Aisyah", "Daniel", "Mei Ling", "Ravi"]
+LAST = ["Abdullah", "Rahman", "Tan", "Lim", "Ismail", "Kumar", "Hassan", "Wong", "Yusof", "Ng"]
+
+# -------------------------
+# Seeding
+# -------------------------
+def seed_store(store_dir: str, rows: int, seed: int) -> None:
+    """Write the template and two rosters into a local store (same seed -> same files)."""
+    from docx import Document
+    from openpyxl import Workbook
+    from localstore import LocalSupabase
+
+    store = LocalSupabase(store_dir)
+    rng = random.Random(seed)
+    work = tempfile.mkdtemp()
+
+    doc = Document()
+    doc.add_paragraph("Dear {name},")
+    doc.add_paragraph("Student ID: {student_id}")
+    doc.add_paragraph("Programme: {program}")
+    doc.add_paragraph("Date: {tarikh}")
+    table = doc.add_table(rows=1, cols=2)
+    table.cell(0, 0).text = "{name}"
+    table.cell(0, 1).text = "{student_id}"
+    tpl_path = os.path.join(work, TEMPLATE_NAME)
+    doc.save(tpl_path)
+
+    def roster(path: str, viva: bool) -> None:
+        wb = Workbook()
+        ws = wb.active
+        ws.append(["Name", "Student ID", "Program", "Degree", "Tarikh Viva"] if viva else ["Name", "Student ID", "Program", "Address"])
+        for i in range(rows):
+            name = f"{rng.choice(FIRST)} {rng.choice(LAST)}"
+            program = rng.choice(["LT750", "LT780"])
+            if viva:
+                ws.append([name, f"2025A{i:05d}", program, rng.choice(["Masters", "PhD"]), f"2025-10-{rng.randint(1, 28):02d}"])
+            else:
+                ws.append([name, f"2025A{i:05d}", program, rng.choice(["Shah Alam", "Johor", "Penang"])])
+        wb.save(path)
+
+    uploads = [("templates", f"templates/{TEMPLATE_NAME}", tpl_path, "templates")]
+    for name, viva in ((LETTERS_DATA, False), (VIVA_DATA, True)):
+        path = os.path.join(work, name)
+        roster(path, viva)
+        uploads.append(("data", name, path, "data"))
+
+    for bucket, key, path, table_name in uploads:
+        store.storage.from_(bucket).upload(key, path, {"upsert": "true"})
+        store.table(table_name).upsert({"filename": os.path.basename(key), "file_url": store.storage.from_(bucket).get_public_url(key)}).execute()
+
+# -------------------------
+# Drivers
+# -------------------------
+def _ok(result) -> bool:
+    msg = result[-1] if isinstance(result, (tuple, list)) else result
+    if isinstance(msg, dict):
+        msg = msg.get("value", "")
+    return isinstance(msg, str) and msg.startswith("✅")
+
+def inprocess_driver(store_dir: str) -> Dict[str, Callable]:
+    os.environ["LETTER_LOCAL_STORAGE"] = store_dir
+    import app
+
+    return {
+        "load_file": lambda: app.load_file(LETTERS_DATA),
+        "gen_sample": lambda: app.gen_sample(TEMPLATE_NAME, "Letter_{name}"),
+        "gen_all": lambda: app.gen_all(TEMPLATE_NAME, "Letter_{name}"),
+        "load_saved_excel": lambda: app.load_saved_excel(VIVA_DATA),
+        "bulk_assign": lambda: app.bulk_assign("program", "", TEMPLATE_NAME, "", "", ""),
+        "generate_viva_letters": lambda: app.generate_viva_letters("Viva_{name}"),
+    }
+
+def remote_driver(url: str) -> Callable[[], Dict[str, Callable]]:
+    from gradio_client import Client
+
+    def make():
+        c = Client(url, verbose=False)  # one client per session, like one browser tab
+        return {
+            "load_file": lambda: c.predict(LETTERS_DATA, api_name="/load_file"),
+            "gen_sample": lambda: c.predict(TEMPLATE_NAME, "Letter_{name}", api_name="/gen_sample"),
+            "gen_all": lambda: c.predict(TEMPLATE_NAME, "Letter_{name}", "stored", 6, 0, "docx", False, api_name="/gen_all"),
+            "load_saved_excel": lambda: c.predict(VIVA_DATA, api_name="/load_saved_excel"),
+            "bulk_assign": lambda: c.predict("program", "", TEMPLATE_NAME, "", "", "", api_name="/bulk_assign"),
+            "generate_viva_letters": lambda: c.predict("Viva_{name}", "stored", 6, 0, "docx", False, api_name="/generate_viva_letters"),
+        }
+    return make
+
+SCENARIO = ["load_file", "gen_sample", "gen_all", "load_saved_excel", "bulk_assign", "generate_viva_letters"]
+
+# -------------------------
+# Measurement
+# -------------------------
+def _proc_kb(pid: int, field: str) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+class MemorySampler:
+    """Polls a process's RSS to find the peak during the run (Linux /proc)."""
+
+    def __init__(self, pid: int, interval: float = 0.05):
+        self.pid, self.interval = pid, interval
+        self.start_kb = _proc_kb(pid, "VmRSS")
+        self.peak_kb = self.start_kb or 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = _proc_kb(self.pid, "VmRSS")
+            if rss:
+                self.peak_kb = max(self.peak_kb, rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile."""
+    if not values:
+        return 0.0
+    s = sorted(values)
+    k = max(0, min(len(s) - 1, math.ceil(p / 100 * len(s)) - 1))
+    return s[k]
+
+def run(make_endpoints: Callable[[], Dict[str, Callable]], sessions: int, rounds: int, warmup: int, pid: int) -> Dict:
+    timings: Dict[str, List[float]] = {name: [] for name in SCENARIO}
+    failures: Dict[str, int] = {name: 0 for name in SCENARIO}
+    lock = threading.Lock()
+
+    def session(_):
+        endpoints = make_endpoints()
+        for r in range(warmup + rounds):
+            for name in SCENARIO:
+                t0 = time.perf_counter()
+                try:
+                    ok = _ok(endpoints[name]())
+                except Exception:
+                    ok = False
+                elapsed = time.perf_counter() - t0
+                if r >= warmup:
+                    with lock:
+                        timings[name].append(elapsed)
+                        failures[name] += 0 if ok else 1
+
+    with MemorySampler(pid) as mem:
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=sessions) as pool:
+            list(pool.map(session, range(sessions)))
+        wall = time.perf_counter() - t0
+
+    calls = sum(len(v) for v in timings.values())
+    return {
+        "wall_seconds": round(wall, 3),
+        "calls": calls,
+        "calls_per_second": round(calls / wall, 2) if wall else 0,
+        "scenarios_per_second": round(sessions * rounds / wall, 3) if wall else 0,
+        "endpoints": {
+            name: {
+                "calls": len(v),
+                "failures": failures[name],
+                "mean_ms": round(1000 * sum(v) / len(v), 1) if v else 0,
+                **{f"p{p}_ms": round(1000 * percentile(v, p), 1) for p in (50, 90, 95, 99)},
+                "max_ms": round(1000 * max(v), 1) if v else 0,
+            }
+            for name, v in timings.items()
+        },
+        "memory": {
+            "rss_start_mb": round((mem.start_kb or 0) / 1024, 1),
+            "rss_peak_mb": round(mem.peak_kb / 1024, 1),
+            "vm_hwm_mb": round((_proc_kb(pid, "VmHWM") or 0) / 1024, 1),
+        },
+    }
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog="loadtest.py", description="Concurrent-session load test for the letter app.")
+    p.add_argument("--sessions", type=int, default=4, help="simulated concurrent users")
+    p.add_argument("--rounds", type=int, default=2, help="scenario repetitions per session (measured)")
+    p.add_argument("--warmup", type=int, default=1, help="unmeasured rounds per session first")
+    p.add_argument("--rows", type=int, default=100, help="rows in each generated roster")
+    p.add_argument("--seed", type=int, default=1234)
+    p.add_argument("--store", default=None, help="local storage folder (default: fresh temp folder)")
+    p.add_argument("--url", default=None, help="drive a running app over HTTP instead of in-process")
+    p.add_argument("--server-pid", type=int, default=None, help="with --url: sample this process's memory")
+    p.add_argument("--out", default=None, help="write the JSON report here as well as stdout")
+    return p
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    store = args.store or tempfile.mkdtemp(prefix="lt_store_")
+    seed_store(store, args.rows, args.seed)
+
+    if args.url:
+        make = remote_driver(args.url)
+        pid = args.server_pid or os.getpid()
+    else:
+        endpoints = inprocess_driver(store)
+        make = lambda: endpoints  # in-process sessions share the app's module state, as real users do
+        pid = os.getpid()
+
+    report = {
+        "config": {k: getattr(args, k) for k in ("sessions", "rounds", "warmup", "rows", "seed", "url")},
+        "environment": {
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "render_workers": os.getenv("LETTER_WORKERS", "1"),
+        },
+        **run(make, args.sessions, args.rounds, args.warmup, pid),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    return 0 if all(e["failures"] == 0 for e in report["endpoints"].values()) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
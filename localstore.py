@@ -0,0 +1,197 @@
+"""Local stand-in for the Supabase client, for offline runs and load tests.
+
+Set LETTER_LOCAL_STORAGE=/some/dir and app.py uses this instead of Supabase.
+It implements only what the app calls:
+
+    store.table("templates").select("file_url").eq("filename", f).execute().data
+    store.table("data").insert({...}) / .upsert({...}) / .update({...}).eq(...)
+    store.storage.from_("templates").upload(path, data) / get_public_url / list / remove
+
+Tables are JSON files under <dir>/tables and buckets are folders under
+<dir>/storage. A small HTTP server serves the buckets, so the "public URLs"
+work with the app's existing `requests.get` downloads.
+"""
+
+import json, os, threading
+from datetime import datetime, timezone
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+LOCAL_STORAGE_PORT = int(os.getenv("LETTER_LOCAL_STORAGE_PORT", "54321"))
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+class _Query:
+    def __init__(self, table: "_Table", op: str, payload=None, columns: str = "*"):
+        self.table, self.op, self.payload, self.columns = table, op, payload, columns
+        self.filters: List = []
+        self._order: Optional[tuple] = None
+        self._limit: Optional[int] = None
+
+    def eq(self, column: str, value) -> "_Query":
+        self.filters.append((column, value))
+        return self
+
+    def order(self, column: str, desc: bool = False) -> "_Query":
+        self._order = (column, desc)
+        return self
+
+    def limit(self, n: int) -> "_Query":
+        self._limit = n
+        return self
+
+    def _match(self, row: Dict) -> bool:
+        return all(row.get(c) == v for c, v in self.filters)
+
+    def execute(self) -> _Result:
+        with self.table.lock:
+            rows = self.table.load()
+            if self.op == "select":
+                out = [r for r in rows if self._match(r)]
+                if self._order:
+                    col, desc = self._order
+                    out.sort(key=lambda r: str(r.get(col) or ""), reverse=desc)
+                if self._limit is not None:
+                    out = out[: self._limit]
+                if self.columns.strip() != "*":
+                    cols = [c.strip() for c in self.columns.split(",")]
+                    out = [{c: r.get(c) for c in cols} for r in out]
+                return _Result(out)
+
+            if self.op == "delete":
+                gone = [r for r in rows if self._match(r)]
+                self.table.save([r for r in rows if not self._match(r)])
+                return _Result(gone)
+
+            if self.op == "update":
+                changed = []
+                for r in rows:
+                    if self._match(r):
+                        r.update(self.payload)
+                        changed.append(r)
+                self.table.save(rows)
+                return _Result(changed)
+
+            # insert, or upsert on filename like the app's tables
+            new = dict(self.payload)
+            new.setdefault("uploaded_at", datetime.now(timezone.utc).isoformat())
+            for r in rows:
+                if self.op == "upsert" and r.get("filename") == new.get("filename"):
+                    r.update(new)
+                    break
+            else:
+                new.setdefault("id", max((r.get("id", 0) for r in rows), default=0) + 1)
+                rows.append(new)
+            self.table.save(rows)
+            return _Result([new])
+
+class _Table:
+    def __init__(self, path: str, lock: threading.Lock):
+        self.path, self.lock = path, lock
+
+    def load(self) -> List[Dict]:
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, rows: List[Dict]) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=1)
+        os.replace(tmp, self.path)
+
+    def select(self, columns: str = "*") -> _Query:
+        return _Query(self, "select", columns=columns)
+
+    def upsert(self, row: Dict) -> _Query:
+        return _Query(self, "upsert", row)
+
+    def insert(self, row: Dict) -> _Query:
+        return _Query(self, "insert", row)
+
+    def update(self, row: Dict) -> _Query:
+        return _Query(self, "update", row)
+
+    def delete(self) -> _Query:
+        return _Query(self, "delete")
+
+class _Bucket:
+    def __init__(self, root: str, name: str, base_url: str):
+        self.root, self.name, self.base_url = root, name, base_url
+
+    def _path(self, path: str) -> str:
+        return os.path.join(self.root, self.name, path.lstrip("/"))
+
+    def upload(self, path: str, file, file_options: Optional[Dict] = None):
+        dest = self._path(path)
+        if os.path.exists(dest) and str((file_options or {}).get("upsert", "false")).lower() != "true":
+            raise RuntimeError(f"The resource already exists: {path}")
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        with open(dest, "wb") as out:
+            if isinstance(file, (bytes, bytearray)):
+                out.write(file)
+            elif isinstance(file, str):
+                with open(file, "rb") as src:
+                    out.write(src.read())
+            else:
+                for chunk in iter(lambda: file.read(1 << 20), b""):
+                    out.write(chunk)
+        return {"path": path}
+
+    def get_public_url(self, path: str) -> str:
+        return f"{self.base_url}/{self.name}/{path.lstrip('/')}"
+
+    def list(self, folder: str = "") -> List[Dict]:
+        base = self._path(folder)
+        if not os.path.isdir(base):
+            return []
+        return [{"name": n} for n in sorted(os.listdir(base)) if os.path.isfile(os.path.join(base, n))]
+
+    def remove(self, paths: List[str]) -> List[Dict]:
+        gone = []
+        for p in paths:
+            try:
+                os.remove(self._path(p))
+                gone.append({"name": p})
+            except FileNotFoundError:
+                pass
+        return gone
+
+class _Storage:
+    def __init__(self, root: str, base_url: str):
+        self.root, self.base_url = root, base_url
+
+    def from_(self, bucket: str) -> _Bucket:
+        return _Bucket(self.root, bucket, self.base_url)
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+class LocalSupabase:
+    """Directory-backed replacement for the subset of `supabase.Client` the app uses."""
+
+    def __init__(self, root: str, port: int = LOCAL_STORAGE_PORT):
+        self.root = os.path.abspath(root)
+        self._storage_root = os.path.join(self.root, "storage")
+        os.makedirs(os.path.join(self.root, "tables"), exist_ok=True)
+        os.makedirs(self._storage_root, exist_ok=True)
+        self._locks: Dict[str, threading.Lock] = {}
+        self.base_url = f"http://127.0.0.1:{port}"
+        self.storage = _Storage(self._storage_root, self.base_url)
+        self._serve(port)
+
+    def _serve(self, port: int) -> None:
+        try:
+            server = ThreadingHTTPServer(("127.0.0.1", port), partial(_QuietHandler, directory=self._storage_root))
+        except OSError:
+            return  # another process (e.g. the app under test) already serves this store
+        threading.Thread(target=server.serve_forever, name="local-storage", daemon=True).start()
+
+    def table(self, name: str) -> _Table:
+        lock = self._locks.setdefault(name, threading.Lock())
+        return _Table(os.path.join(self.root, "tables", f"{name}.json"), lock)
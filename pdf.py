@@ -0,0 +1,222 @@
+"""Optional PDF stage: convert rendered .docx letters with headless LibreOffice.
+
+Converters are started once and reused. Each worker owns a private
+LibreOffice profile, so several can run side by side:
+
+- If a Python that can import LibreOffice's bridge (`uno`) is available
+  (UNO_PYTHON, or /usr/bin/python3 with Debian's python3-uno), a worker
+  starts pdfbridge.py under it. The bridge keeps one `soffice --headless`
+  process running and converts documents over its socket, so there is no
+  process launch per file.
+- Otherwise a worker runs `soffice --convert-to pdf` once per batch of files,
+  reusing its already-initialised profile.
+
+Converted PDFs are yielded as they finish, so they can be written into the
+archive while the rest are still converting.
+"""
+
+import atexit, json, os, queue, shutil, signal, subprocess, sys, tempfile, threading
+from functools import lru_cache
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))
+PDF_BATCH_SIZE = int(os.getenv("PDF_BATCH_SIZE", "20"))
+PDF_TIMEOUT = int(os.getenv("PDF_TIMEOUT", "300"))  # seconds per batch (CLI) or per file (bridge)
+BRIDGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pdfbridge.py")
+
+def find_soffice() -> Optional[str]:
+    return os.getenv("SOFFICE_PATH") or shutil.which("soffice") or shutil.which("libreoffice")
+
+def require_soffice() -> str:
+    """The LibreOffice binary, or RuntimeError with a message fit for the user."""
+    soffice = find_soffice()
+    if not soffice:
+        raise RuntimeError("LibreOffice (soffice) not found; install it or set SOFFICE_PATH to enable PDF output")
+    return soffice
+
+def _pdf_path(docx_path: str) -> str:
+    return os.path.splitext(docx_path)[0] + ".pdf"
+
+@lru_cache(maxsize=1)
+def find_uno_python() -> Optional[str]:
+    """A Python interpreter that can `import uno`, or None (checked once per process)."""
+    candidates = [os.getenv("UNO_PYTHON"), sys.executable, "/usr/bin/python3", "/usr/lib/libreoffice/program/python"]
+    for python in dict.fromkeys(c for c in candidates if c and os.path.exists(c)):
+        try:
+            if subprocess.run([python, "-c", "import uno"], capture_output=True, timeout=30).returncode == 0:
+                return python
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+    return None
+
+class _Worker:
+    """One LibreOffice instance with its own profile directory."""
+
+    def __init__(self, soffice: str):
+        self.soffice = soffice
+        self.profile = tempfile.mkdtemp(prefix="lo_profile_")
+        self.uno_python = find_uno_python()
+        self.use_uno = self.uno_python is not None
+        self.bridge: Optional[subprocess.Popen] = None
+
+    def _base_args(self) -> List[str]:
+        profile_url = "file://" + os.path.abspath(self.profile).replace(os.sep, "/")
+        return [self.soffice, "--headless", "--invisible", "--nologo", "--norestore", f"-env:UserInstallation={profile_url}"]
+
+    # --- Persistent (UNO bridge) mode ---
+    def _start(self) -> None:
+        self.bridge = subprocess.Popen(
+            [self.uno_python, BRIDGE, self.soffice, self.profile],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, bufsize=1,
+            start_new_session=True,  # so a stuck bridge can be killed together with its soffice
+        )
+        reply = self._read()
+        if not reply.get("ready"):
+            self.stop()
+            raise RuntimeError(reply.get("error") or "LibreOffice did not start")
+
+    def _read(self) -> dict:
+        # A hung LibreOffice never answers; killing the bridge ends the wait with EOF
+        timer = threading.Timer(PDF_TIMEOUT, self._kill, (self.bridge,))
+        timer.start()
+        try:
+            line = self.bridge.stdout.readline()
+        finally:
+            timer.cancel()
+        if not line:
+            raise RuntimeError("PDF converter stopped (timed out or crashed)")
+        return json.loads(line)
+
+    def _convert_uno(self, src: str) -> str:
+        if self.bridge is None or self.bridge.poll() is not None:
+            self._start()
+        dst = _pdf_path(src)
+        self.bridge.stdin.write(json.dumps({"src": os.path.abspath(src), "dst": os.path.abspath(dst)}) + "\n")
+        self.bridge.stdin.flush()
+        reply = self._read()
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+        return dst
+
+    # --- Batch (command line) mode ---
+    def _convert_cli(self, batch: List[str]) -> None:
+        by_dir = {}
+        for f in batch:
+            by_dir.setdefault(os.path.dirname(os.path.abspath(f)), []).append(f)
+        for out_dir, files in by_dir.items():
+            subprocess.run(
+                self._base_args() + ["--convert-to", "pdf", "--outdir", out_dir, *files],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=PDF_TIMEOUT, check=False,
+            )
+
+    def convert(self, batch: List[str]) -> List[Tuple[str, Optional[str]]]:
+        """Convert a batch. Returns (pdf_path or docx_path, error) per file."""
+        if not self.use_uno:
+            try:
+                self._convert_cli(batch)
+            except subprocess.TimeoutExpired:
+                return [(f, "PDF conversion timed out") for f in batch]
+            return [
+                (_pdf_path(f), None) if os.path.exists(_pdf_path(f)) else (f, "PDF conversion failed")
+                for f in batch
+            ]
+
+        results = []
+        for f in batch:
+            try:
+                results.append((self._convert_uno(f), None))
+            except Exception as e:
+                # The bridge may have died or hung; start a fresh one for the next file
+                self.stop()
+                results.append((f, str(e) if str(e).startswith("PDF") else f"PDF conversion failed: {e}"))
+        return results
+
+    @staticmethod
+    def _kill(bridge: subprocess.Popen) -> None:
+        try:
+            os.killpg(bridge.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        bridge.wait()
+
+    def stop(self) -> None:
+        bridge, self.bridge = self.bridge, None
+        if bridge is None:
+            return
+        try:
+            bridge.stdin.close()  # EOF: the bridge shuts its soffice down
+        except Exception:
+            pass
+        try:
+            bridge.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            pass
+        self._kill(bridge)  # also anything the bridge left running in its group
+
+class PdfPool:
+    """A fixed set of converter workers fed from a shared queue."""
+
+    def __init__(self, size: int = PDF_WORKERS, batch_size: int = PDF_BATCH_SIZE):
+        soffice = require_soffice()
+        self.batch_size = max(1, batch_size)
+        self._jobs: "queue.Queue" = queue.Queue()
+        self._workers = [_Worker(soffice) for _ in range(max(1, size))]
+        self._threads = [threading.Thread(target=self._run, args=(w,), daemon=True) for w in self._workers]
+        for t in self._threads:
+            t.start()
+
+    def _run(self, worker: _Worker) -> None:
+        while True:
+            item = self._jobs.get()
+            if item is None:
+                worker.stop()
+                shutil.rmtree(worker.profile, ignore_errors=True)
+                return
+            batch, results = item
+            try:
+                for r in worker.convert(batch):
+                    results.put(r)
+            except Exception as e:
+                for f in batch:
+                    results.put((f, f"PDF conversion failed: {e}"))
+
+    def convert(self, files: Iterable[str], errors: List[str]) -> Iterator[str]:
+        """Convert .docx files to PDF concurrently, yielding PDF paths as they finish.
+
+        Failures are reported into `errors` and skipped.
+        """
+        results: "queue.Queue" = queue.Queue()
+        pending = 0
+        files = iter(files)
+        while True:
+            batch = list(islice(files, self.batch_size))
+            if not batch:
+                break
+            self._jobs.put((batch, results))
+            pending += len(batch)
+        while pending:
+            path, err = results.get()
+            pending -= 1
+            if err:
+                errors.append(f"{os.path.basename(path)}: {err}")
+            else:
+                yield path
+
+    def close(self) -> None:
+        for _ in self._threads:
+            self._jobs.put(None)
+        for t in self._threads:
+            t.join(timeout=30)
+
+_POOL: Optional[PdfPool] = None
+_POOL_LOCK = threading.Lock()
+
+def get_pdf_pool() -> PdfPool:
+    """The process-wide converter pool, started on first use and kept for reuse."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = PdfPool()
+            atexit.register(_POOL.close)
+        return _POOL
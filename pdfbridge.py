@@ -0,0 +1,114 @@
+"""Persistent .docx -> PDF converter, run under a Python that has LibreOffice's `uno`.
+
+pdf.py starts one of these per worker (the app's own interpreter usually
+can't import `uno`; Debian's python3-uno only works with /usr/bin/python3):
+
+    /usr/bin/python3 pdfbridge.py <soffice> <profile dir>
+
+It starts one headless soffice listening on a local socket, connects to it
+over UNO and prints {"ready": true}. Then it reads one JSON request per
+line from stdin, {"src": "a.docx", "dst": "a.pdf"}, and answers each with
+{"ok": true} or {"error": "..."}. If soffice dies it is restarted for the
+next file. EOF on stdin shuts everything down.
+
+Standard library only: it runs outside the app's environment.
+"""
+
+import json, os, signal, socket, subprocess, sys, time
+
+import uno
+from com.sun.star.beans import PropertyValue
+
+START_TIMEOUT = 60
+
+def _prop(name, value):
+    p = PropertyValue()
+    p.Name, p.Value = name, value
+    return p
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+class Office:
+    def __init__(self, soffice: str, profile: str):
+        self.soffice = soffice
+        self.profile_url = "file://" + os.path.abspath(profile).replace(os.sep, "/")
+        self.proc = None
+        self.desktop = None
+
+    def start(self) -> None:
+        port = _free_port()
+        self.proc = subprocess.Popen(
+            [self.soffice, "--headless", "--invisible", "--nologo", "--norestore",
+             f"-env:UserInstallation={self.profile_url}", f"--accept=socket,host=127.0.0.1,port={port};urp;"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local)
+        deadline = time.time() + START_TIMEOUT
+        while True:
+            try:
+                ctx = resolver.resolve(f"uno:socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext")
+                break
+            except Exception:
+                if time.time() > deadline or self.proc.poll() is not None:
+                    self.stop()
+                    raise RuntimeError("LibreOffice did not start")
+                time.sleep(0.25)
+        self.desktop = ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+
+    def convert(self, src: str, dst: str) -> None:
+        if self.desktop is None:
+            self.start()
+        doc = self.desktop.loadComponentFromURL(uno.systemPathToFileUrl(os.path.abspath(src)), "_blank", 0, (_prop("Hidden", True),))
+        try:
+            doc.storeToURL(uno.systemPathToFileUrl(os.path.abspath(dst)), (_prop("FilterName", "writer_pdf_Export"),))
+        finally:
+            doc.close(True)
+
+    def stop(self) -> None:
+        if self.desktop is not None:
+            try:
+                self.desktop.terminate()
+            except Exception:
+                pass
+            self.desktop = None
+        if self.proc is not None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+            self.proc = None
+
+def _reply(message: dict) -> None:
+    sys.stdout.write(json.dumps(message) + "\n")
+    sys.stdout.flush()
+
+def main() -> int:
+    soffice, profile = sys.argv[1], sys.argv[2]
+    office = Office(soffice, profile)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))  # run the finally below
+    try:
+        try:
+            office.start()
+        except Exception as e:
+            _reply({"error": str(e)})
+            return 1
+        _reply({"ready": True})
+        for line in sys.stdin:
+            request = json.loads(line)
+            try:
+                office.convert(request["src"], request["dst"])
+                _reply({"ok": True})
+            except Exception as e:
+                office.stop()  # it may have died; start a fresh one for the next file
+                _reply({"error": f"PDF conversion failed: {e}"})
+    finally:
+        office.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""Pre-flight checks run against a loaded dataset before a batch renders.
+
+Each check looks at a whole column at once. Predicates run once per distinct
+value (see `Dataset.select`), so even large rosters are checked in
+milliseconds. Problems that will skip or break letters are errors;
+everything else is a warning.
+"""
+
+import os
+from typing import Callable, Iterable, List, Optional, Set
+
+import pandas as pd
+
+from letters import resolve_template
+from rowstore import Dataset
+
+# Fields viva rendering fills in itself (see letters.prepare_viva_record)
+VIVA_FIELDS = {"name", "nama", "template", "program", "degree", "jenis_degree", "tarikh_submit", "tarikh", "date", "tarikh_viva"}
+
+def _blank(v: str) -> bool:
+    return not v.strip()
+
+def _rows(ids: List[int], limit: int = 8) -> str:
+    shown = ", ".join(str(i + 1) for i in ids[:limit])
+    more = f" (+{len(ids) - limit} more)" if len(ids) > limit else ""
+    return f"row{'s' if len(ids) > 1 else ''} {shown}{more}"
+
+class PreflightReport:
+    def __init__(self, rows: int):
+        self.rows = rows
+        self.errors: List[str] = []
+        self.warnings: List[str] = []
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def summary(self) -> str:
+        lines = [f"❌ {e}" for e in self.errors] + [f"⚠️ {w}" for w in self.warnings]
+        if not lines:
+            return f"✅ {self.rows} rows checked, no problems found."
+        head = f"{'❌' if self.errors else '⚠️'} {self.rows} rows checked: {len(self.errors)} errors, {len(self.warnings)} warnings"
+        return "\n".join([head] + lines)
+
+def _check_placeholders(report: PreflightReport, placeholders: Iterable[str], ds: Dataset, extra: Set[str] = frozenset(), where: str = "") -> None:
+    columns = {c.lower(): c for c in ds.columns}
+    available = set(columns) | set(extra)
+    where = f" in {where}" if where else ""
+    for p in sorted(set(placeholders)):
+        key = p.lower()
+        if key not in available:
+            report.warnings.append(f"Placeholder {{{p}}}{where} has no matching column and will stay as-is.")
+        elif p not in (key, p.upper()):
+            report.warnings.append(f"Placeholder {{{p}}}{where} is mixed case and won't be filled; use {{{key}}} or {{{key.upper()}}}.")
+        elif key in columns and key not in extra:
+            empty = ds.select(columns[key], _blank, missing=True)
+            if empty:
+                report.warnings.append(f"{{{p}}} is empty in {_rows(empty)}.")
+
+def _check_images(report: PreflightReport, ds: Dataset, exists: Callable[[str], bool]) -> None:
+    for col in ds.columns:
+        if col.lower().endswith("image"):
+            bad = ds.select(col, lambda v: bool(v.strip()) and not exists(v.strip()))
+            if bad:
+                report.errors.append(f"Image path in '{col}' not found for {_rows(bad)}; the path text would be printed instead.")
+
+def check_letters(
+    placeholders: Optional[Iterable[str]], ds: Dataset, exists: Callable[[str], bool] = os.path.exists, template: str = "",
+) -> PreflightReport:
+    """Check a 'Generate Letters' dataset against one template's placeholders (None = template couldn't be loaded)."""
+    report = PreflightReport(len(ds))
+    if placeholders is None:
+        report.errors.append(f"{f'Template {template}' if template else 'The template'} could not be loaded; no letters can be generated.")
+    if not len(ds):
+        report.errors.append("No rows loaded.")
+        return report
+    if placeholders is not None:
+        _check_placeholders(report, placeholders, ds)
+    _check_images(report, ds, exists)
+    return report
+
+def check_viva(
+    ds: Dataset,
+    template_names: List[str],
+    placeholders_for: Optional[Callable[[str], Optional[List[str]]]] = None,
+    exists: Callable[[str], bool] = os.path.exists,
+) -> PreflightReport:
+    """Check viva students: names, template assignments, dates, images and each used template's placeholders."""
+    report = PreflightReport(len(ds))
+    if not len(ds):
+        report.errors.append("No students loaded.")
+        return report
+
+    # --- Names ---
+    no_name = set(ds.select("name", _blank, missing=True)) & set(ds.select("nama", _blank, missing=True))
+    if no_name:
+        report.errors.append(f"Missing student name in {_rows(sorted(no_name))}; these letters will be skipped.")
+
+    # --- Templates (each distinct choice resolved once) ---
+    resolved = {v: resolve_template(v, template_names) for v in ds.distinct("template") if v.strip()}
+    unassigned = ds.select("template", _blank, missing=True)
+    if unassigned:
+        report.errors.append(f"No template assigned for {_rows(unassigned)}.")
+    unknown = sorted(v for v, f in resolved.items() if not f)
+    if unknown:
+        bad = ds.select("template", lambda v: v in unknown)
+        report.errors.append(f"Template {', '.join(repr(v) for v in unknown)} not found for {_rows(bad)}.")
+
+    # --- Dates (each distinct value parsed once) ---
+    date_col = "tarikh_viva" if "tarikh_viva" in ds.columns else "date"
+    unparsable = {v for v in ds.distinct(date_col) if v.strip() and pd.isna(pd.to_datetime(v, errors="coerce"))}
+    if unparsable:
+        bad = ds.select(date_col, lambda v: v in unparsable)
+        report.warnings.append(f"Unreadable date in {_rows(bad)}; today's date will be used.")
+
+    _check_images(report, ds, exists)
+
+    # --- Placeholders of every template in use ---
+    if placeholders_for:
+        for tpl_file in sorted({f for f in resolved.values() if f}):
+            try:
+                placeholders = placeholders_for(tpl_file)
+            except Exception as e:
+                print(f"⚠️ Could not read template {tpl_file}:", e)
+                placeholders = None
+            if placeholders is None:
+                bad = ds.select("template", lambda v: resolved.get(v) == tpl_file)
+                report.errors.append(f"Template {tpl_file} could not be loaded; letters for {_rows(bad)} will fail.")
+                continue
+            _check_placeholders(report, placeholders, ds, VIVA_FIELDS, where=tpl_file)
+    return report
@@ -0,0 +1,189 @@
+"""Inline HTML preview of one row, without writing a .docx.
+
+The first preview of a template walks its paragraphs and tables once and
+turns them into a list of ready-made HTML pieces and placeholder slots.
+That list is kept per compiled template, so every later row only fills
+the slots: stepping through rows takes well under a millisecond and never
+touches python-docx again.
+
+Slots are filled the way letters.replace_placeholders fills a letter, so
+the preview shows what the letter will contain. Placeholders that would
+stay in the letter are highlighted:
+
+    missing   no column of that name in the row
+    empty     the row has the column but the cell is blank (the letter
+              gets a blank there)
+    split     Word broke the placeholder across formatting runs, so it is
+              never filled; retype it in the template in one go
+
+Only the body is shown (headers and footers are not filled either), as
+plain paragraphs and tables without page layout.
+"""
+
+import html, os, re
+from typing import Dict, List, NamedTuple, Tuple, Union
+from weakref import WeakKeyDictionary
+
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml.ns import qn
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+
+from letters import CompiledTemplate
+
+_TOKEN = re.compile(r"\{\{(.*?)\}\}|\{(.*?)\}")  # same pattern as letters.placeholders_in
+_ALIGN = {WD_ALIGN_PARAGRAPH.CENTER: "center", WD_ALIGN_PARAGRAPH.RIGHT: "right", WD_ALIGN_PARAGRAPH.JUSTIFY: "justify"}
+
+PREVIEW_CSS = """
+.letter-preview {background:#fff; color:#222; padding:24px 32px; border:1px solid #ddd; max-height:560px; overflow-y:auto; font-family:Calibri, Arial, sans-serif;}
+.letter-preview p {margin:0 0 6px 0; min-height:1em;}
+.letter-preview table {border-collapse:collapse; margin:6px 0;}
+.letter-preview td {border:1px solid #ccc; padding:2px 6px; vertical-align:top;}
+.letter-preview .pv-value {background:#eaf6ea;}
+.letter-preview mark {padding:0 2px; border-radius:3px;}
+.letter-preview .pv-missing {background:#ffd6d6; color:#a00;}
+.letter-preview .pv-empty {background:#fff1c2; color:#8a6d00;}
+.letter-preview .pv-split {background:#e4d6ff; color:#4b2a99;}
+.letter-preview .pv-pic {color:#777; font-style:italic;}
+"""
+
+class _Slot(NamedTuple):
+    key: str  # text between the braces
+    token: str  # the placeholder as written, e.g. "{name}"
+
+Piece = Union[str, _Slot]
+
+_SKELETONS: "WeakKeyDictionary[CompiledTemplate, Tuple[List[Piece], List[str]]]" = WeakKeyDictionary()
+
+# -------------------------
+# Compiling a template
+# -------------------------
+def _text_html(text: str) -> str:
+    return html.escape(text).replace("\t", "&emsp;").replace("\n", "<br>")
+
+def _run_tags(run) -> Tuple[str, str]:
+    opening = "".join(t for on, t in ((run.bold, "<b>"), (run.italic, "<i>"), (run.underline, "<u>")) if on)
+    closing = "".join(t for on, t in ((run.underline, "</u>"), (run.italic, "</i>"), (run.bold, "</b>")) if on)
+    return opening, closing
+
+def _paragraph(par: Paragraph, out: List[Piece], split_tokens: List[str]) -> None:
+    style = (par.style.name if par.style is not None else "") or ""
+    level = style[len("Heading "):] if style.startswith("Heading ") else ""
+    tag = f"h{min(int(level) + 2, 6)}" if level.isdigit() else "p"
+    align = _ALIGN.get(par.alignment)
+    out.append(f'<{tag} style="text-align:{align}">' if align else f"<{tag}>")
+
+    runs = list(par.runs)
+    texts = [r.text for r in runs]
+    starts = [0]
+    for t in texts:
+        starts.append(starts[-1] + len(t))
+
+    # Placeholders inside one run are filled; ones that cross a run boundary never are
+    in_run = [(starts[i] + m.start(), starts[i] + m.end()) for i, t in enumerate(texts) for m in _TOKEN.finditer(t)]
+    split = [
+        (m.start(), m.end()) for m in _TOKEN.finditer("".join(texts))
+        if not any(a < m.end() and m.start() < b for a, b in in_run)
+    ]
+    split_starts = {a: b for a, b in split}
+    split_tokens += ["".join(texts)[a:b] for a, b in split]
+    split_end = -1
+
+    for i, run in enumerate(runs):
+        opening, closing = _run_tags(run)
+        pos, text = starts[i], texts[i]
+        tokens = {a: b for a, b in in_run if starts[i] <= a < starts[i + 1]}
+        j = 0
+        while j < len(text):
+            at = pos + j
+            if at in split_starts and split_end < 0:
+                out.append('<mark class="pv-split" title="Split across formatting in Word; this placeholder won\'t be filled">')
+                split_end = split_starts[at]
+            if at in tokens:
+                token = text[j:tokens[at] - pos]
+                out += [opening, _Slot(token.strip("{}"), token), closing]
+                j = tokens[at] - pos
+                continue
+            # Plain text up to the next token or split boundary in this run
+            stops = [b - pos for b in list(tokens) + list(split_starts) + [split_end] if pos + j < b < pos + len(text)]
+            nxt = min(stops, default=len(text))
+            out.append(f"{opening}{_text_html(text[j:nxt])}{closing}")
+            j = nxt
+            if split_end >= 0 and pos + j >= split_end:
+                out.append("</mark>")
+                split_end = -1
+        if run._element.find(f".//{qn('w:drawing')}") is not None:
+            out.append('<span class="pv-pic">[picture]</span>')
+    if split_end >= 0:
+        out.append("</mark>")
+    out.append(f"</{tag}>")
+
+def _blocks(parent, element, out: List[Piece], split_tokens: List[str]) -> None:
+    """Paragraphs and tables of `element` (the body or a table cell) in document order."""
+    for child in element.iterchildren():
+        if child.tag == qn("w:p"):
+            _paragraph(Paragraph(child, parent), out, split_tokens)
+        elif child.tag == qn("w:tbl"):
+            out.append("<table>")
+            for row in Table(child, parent).rows:
+                out.append("<tr>")
+                seen = set()
+                for cell in row.cells:
+                    if id(cell._tc) in seen:  # merged cells repeat
+                        continue
+                    seen.add(id(cell._tc))
+                    out.append("<td>")
+                    _blocks(cell, cell._tc, out, split_tokens)
+                    out.append("</td>")
+                out.append("</tr>")
+            out.append("</table>")
+
+def skeleton(template: CompiledTemplate) -> Tuple[List[Piece], List[str]]:
+    """(HTML pieces and placeholder slots, split placeholders), built once per compiled template."""
+    cached = _SKELETONS.get(template)
+    if cached is None:
+        doc = template.new_document()
+        raw: List[Piece] = []
+        split_tokens: List[str] = []
+        _blocks(doc, doc.element.body, raw, split_tokens)
+        pieces: List[Piece] = []
+        for p in raw:  # merge neighbouring strings so rendering is one join
+            if isinstance(p, str) and pieces and isinstance(pieces[-1], str):
+                pieces[-1] += p
+            elif p != "":
+                pieces.append(p)
+        cached = _SKELETONS[template] = (pieces, split_tokens)
+    return cached
+
+# -------------------------
+# Rendering a row
+# -------------------------
+def _fill(slot: _Slot, fields: Dict[str, str], unfilled: List[str], empty: List[str]) -> str:
+    key = slot.key
+    if slot.token.startswith("{{"):
+        # replace_placeholders swaps the inner {key} first, so {{key}} keeps its outer braces
+        inner = _fill(_Slot(key, f"{{{key}}}"), fields, unfilled, empty)
+        return f"{{{inner}}}"
+    if key in fields:
+        value = fields[key]
+    elif key.isupper() and key.lower() in fields:
+        value = fields[key.lower()].upper()
+    else:
+        unfilled.append(slot.token)
+        hint = f"Write it as {{{key.lower()}}} or {{{key.upper()}}}" if key.lower() in fields else f"No column named '{key}'"
+        return f'<mark class="pv-missing" title="{html.escape(hint)}">{html.escape(slot.token)}</mark>'
+    value = str(value)
+    if not value.strip():
+        empty.append(slot.token)
+        return f'<mark class="pv-empty" title="Empty in this row; the letter will have a blank here">{html.escape(slot.token)}</mark>'
+    if key.lower().endswith("image") and os.path.exists(value):
+        return f'<span class="pv-pic">[image: {html.escape(os.path.basename(value))}]</span>'
+    return f'<span class="pv-value" title="{html.escape(slot.token)}">{_text_html(value)}</span>'
+
+def render_html(template: CompiledTemplate, fields: Dict[str, str]) -> Tuple[str, List[str], List[str]]:
+    """One row as HTML. Returns (html, placeholders left in the letter, placeholders filled with a blank)."""
+    lower_fields = {k.lower(): v for k, v in fields.items()}
+    pieces, split_tokens = skeleton(template)
+    unfilled, empty = list(split_tokens), []
+    body = "".join(p if isinstance(p, str) else _fill(p, lower_fields, unfilled, empty) for p in pieces)
+    return f'<div class="letter-preview">{body}</div>', unfilled, empty
@@ -0,0 +1,93 @@
+"""Opt-in profiling of a single generation batch.
+
+`profile_batch(True, out_dir, prefix)` runs the enclosed block under
+cProfile and a stack sampler at the same time, then writes:
+
+    <prefix>_profile.pstats          load with `python -m pstats` or snakeviz
+    <prefix>_profile.txt             top functions by cumulative time
+    <prefix>_profile.collapsed.txt   "frame;frame;frame count" lines for
+                                     flamegraph.pl / speedscope / inferno
+
+Only the calling thread is profiled, so batches should render in-process
+while profiling. With the switch off it returns a nullcontext, so there is
+no overhead at all.
+"""
+
+import cProfile, io, os, pstats, sys, threading
+from collections import Counter
+from contextlib import nullcontext
+from typing import List
+
+PROFILE_BATCHES = os.getenv("LETTER_PROFILE", "").strip().lower() in ("1", "true", "yes", "on")
+PROFILE_INTERVAL = float(os.getenv("LETTER_PROFILE_INTERVAL_MS", "5")) / 1000  # sampler period
+PROFILE_TOP = 40
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+class _StackSampler:
+    """Records the target thread's call stack every `interval` seconds."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="batch-profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+class BatchProfile:
+    def __init__(self, out_dir: str, prefix: str, interval: float = PROFILE_INTERVAL):
+        self.base = os.path.join(out_dir, f"{prefix}_profile")
+        self.interval = interval
+        self.files: List[str] = []
+        self._profiler = None
+        self._sampler = None
+
+    def __enter__(self) -> "BatchProfile":
+        self._sampler = _StackSampler(threading.get_ident(), self.interval)
+        self._profiler = cProfile.Profile()
+        try:
+            self._profiler.enable()
+        except ValueError as e:  # another profiler already active (e.g. a concurrent batch on Python 3.12+)
+            print("⚠️ cProfile unavailable for this batch, sampling only:", e)
+            self._profiler = None
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._sampler.stop()
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.dump_stats(f"{self.base}.pstats")
+            text = io.StringIO()
+            pstats.Stats(self._profiler, stream=text).sort_stats("cumulative").print_stats(PROFILE_TOP)
+            with open(f"{self.base}.txt", "w", encoding="utf-8") as f:
+                f.write(text.getvalue())
+            self.files += [f"{self.base}.pstats", f"{self.base}.txt"]
+        with open(f"{self.base}.collapsed.txt", "w", encoding="utf-8") as f:
+            for stack, count in self._sampler.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        self.files.append(f"{self.base}.collapsed.txt")
+        return False
+
+def profile_batch(enabled: bool, out_dir: str, prefix: str):
+    """A BatchProfile when `enabled`, otherwise a no-op context (yields None)."""
+    return BatchProfile(out_dir, prefix) if enabled else nullcontext()
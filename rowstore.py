@@ -0,0 +1,238 @@
+"""Compact in-memory storage for loaded data files.
+
+A roster kept as one dict per row repeats every key and every program/degree
+string hundreds of thousands of times. `Dataset` stores the same rows as
+columns instead: one shared column index, one `array` of small integer codes
+per column, and a per-column pool of distinct values, so repeated values such
+as program and degree are stored once. Rows are handed out as `Row` views
+that behave like the dicts the generators have always received.
+"""
+
+from array import array
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, MutableMapping, Optional, Sequence, Tuple
+
+def normalize_key(value) -> str:
+    """Case- and whitespace-insensitive form of a name used as a lookup key."""
+    return " ".join(str(value or "").split()).casefold()
+
+# Code 0 marks "this row has no such key", so rows pasted with different keys
+# keep exactly the keys they were given.
+_MISSING = 0
+
+class _Column:
+    __slots__ = ("codes", "pool", "lookup")
+
+    def __init__(self, length: int = 0):
+        self.codes = array("I", bytes(4 * length))
+        self.pool: List[Optional[str]] = [None]
+        self.lookup: Dict[str, int] = {}
+
+    def encode(self, value) -> int:
+        value = "" if value is None else str(value)
+        code = self.lookup.get(value)
+        if code is None:
+            code = self.lookup[value] = len(self.pool)
+            self.pool.append(value)
+        return code
+
+class Dataset:
+    """Column-oriented rows with dict-like row views."""
+
+    def __init__(self, columns: Iterable[str] = ()):
+        self.columns: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._data: List[_Column] = []
+        self._len = 0
+        for c in columns:
+            self._add_column(c)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Mapping[str, str]]) -> "Dataset":
+        ds = cls()
+        for r in records:
+            ds.append(r)
+        return ds
+
+    @classmethod
+    def from_columns(cls, columns: Mapping[str, Tuple[Sequence[str], Iterable[int]]]) -> "Dataset":
+        """Build from already-encoded columns: name -> (distinct values, 0-based code per row).
+
+        Lets callers that factorize whole columns at once (e.g. with pandas)
+        skip the per-row `append`. Every column must have the same length.
+        """
+        ds = cls()
+        for name, (values, codes) in columns.items():
+            col = ds._add_column(name)
+            col.pool.extend(values)
+            col.lookup = {v: i for i, v in enumerate(col.pool) if i}
+            col.codes = array("I", [c + 1 for c in codes])
+            if ds.columns[0] != name and len(col.codes) != ds._len:
+                raise ValueError(f"column '{name}' has {len(col.codes)} rows, expected {ds._len}")
+            ds._len = len(col.codes)
+        return ds
+
+    def _add_column(self, name: str) -> _Column:
+        col = _Column(self._len)
+        self._index[name] = len(self.columns)
+        self.columns.append(name)
+        self._data.append(col)
+        return col
+
+    def append(self, record: Mapping[str, str]) -> None:
+        for name in record:
+            if name not in self._index:
+                self._add_column(name)
+        for name, col in zip(self.columns, self._data):
+            col.codes.append(col.encode(record[name]) if name in record else _MISSING)
+        self._len += 1
+
+    # --- Cell access ---
+    def get(self, i: int, column: str, default=None):
+        j = self._index.get(column)
+        if j is None:
+            return default
+        col = self._data[j]
+        code = col.codes[i]
+        return default if code == _MISSING else col.pool[code]
+
+    def set(self, i: int, column: str, value) -> None:
+        j = self._index.get(column)
+        col = self._add_column(column) if j is None else self._data[j]
+        col.codes[i] = col.encode(value)
+
+    def has(self, i: int, column: str) -> bool:
+        j = self._index.get(column)
+        return j is not None and self._data[j].codes[i] != _MISSING
+
+    def select(self, column: str, predicate: Callable[[str], bool], missing: bool = False) -> List[int]:
+        """Row ids whose `column` value satisfies `predicate`.
+
+        The predicate runs once per distinct value in the column's pool and
+        rows are then picked by code, so checking 100k rows that share a few
+        hundred values costs a few hundred calls. Rows without the column are
+        included when `missing` is true.
+        """
+        j = self._index.get(column)
+        if j is None:
+            return list(range(self._len)) if missing else []
+        col = self._data[j]
+        wanted = {c for c, v in enumerate(col.pool) if v is not None and predicate(v)}
+        if missing:
+            wanted.add(_MISSING)
+        return [i for i, c in enumerate(col.codes) if c in wanted]
+
+    def find(self, column: str, value: str) -> List[int]:
+        """Row ids whose `column` equals `value`, ignoring case and extra spaces."""
+        key = normalize_key(value)
+        return self.select(column, lambda v: normalize_key(v) == key)
+
+    def distinct(self, column: str) -> List[str]:
+        """The distinct values present in `column`."""
+        j = self._index.get(column)
+        if j is None:
+            return []
+        col = self._data[j]
+        used = set(col.codes)
+        return [v for c, v in enumerate(col.pool) if c in used and v is not None]
+
+    def fill(self, column: str, value, rows: Iterable[int]) -> None:
+        """Set `column` to the same `value` on every row in `rows`."""
+        j = self._index.get(column)
+        col = self._add_column(column) if j is None else self._data[j]
+        code = col.encode(value)
+        for i in rows:
+            col.codes[i] = code
+
+    def column(self, name: str, default: str = "") -> List[str]:
+        """Decoded values of one column (missing cells become `default`)."""
+        j = self._index.get(name)
+        if j is None:
+            return [default] * self._len
+        col = self._data[j]
+        pool = [default] + col.pool[1:]
+        return [pool[c] for c in col.codes]
+
+    # --- Sequence protocol ---
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, i: int) -> "Row":
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError("row index out of range")
+        return Row(self, i)
+
+    def __iter__(self) -> Iterator["Row"]:
+        for i in range(self._len):
+            yield Row(self, i)
+
+class Row(MutableMapping):
+    """A live, dict-like view of one dataset row. Writes go to the dataset."""
+
+    __slots__ = ("_ds", "index")
+
+    def __init__(self, ds: Dataset, index: int):
+        self._ds = ds
+        self.index = index
+
+    def __getitem__(self, key: str) -> str:
+        value = self._ds.get(self.index, key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def get(self, key: str, default=None):
+        return self._ds.get(self.index, key, default)
+
+    def __setitem__(self, key: str, value) -> None:
+        self._ds.set(self.index, key, value)
+
+    def __delitem__(self, key: str) -> None:
+        if not self._ds.has(self.index, key):
+            raise KeyError(key)
+        self._ds._data[self._ds._index[key]].codes[self.index] = _MISSING
+
+    def __contains__(self, key) -> bool:
+        return self._ds.has(self.index, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return (c for c in self._ds.columns if self._ds.has(self.index, c))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"Row({dict(self)!r})"
+
+class RowIndex:
+    """Lookup from student name to row id, built once when data loads.
+
+    Each row gets a display label: its name, or 'Name (2)', 'Name (3)'... for
+    later rows sharing a name (skipping any label already taken), so every
+    label points at exactly one row.
+    """
+
+    def __init__(self, ds: Dataset, name_columns: Iterable[str] = ("name", "nama")):
+        self.labels: List[str] = []
+        self._by_label: Dict[str, int] = {}
+        self._by_name: Dict[str, List[int]] = {}
+        cols = [ds.column(c) for c in name_columns]
+        for i in range(len(ds)):
+            name = next((str(col[i]).strip() for col in cols if str(col[i]).strip()), "")
+            ids = self._by_name.setdefault(normalize_key(name), [])
+            ids.append(i)
+            n = len(ids)
+            label = name if n == 1 else f"{name} ({n})"
+            while label in self._by_label:  # a name in the data may itself read 'Ali (2)'
+                n += 1
+                label = f"{name} ({n})"
+            self.labels.append(label)
+            self._by_label[label] = i
+
+    def find(self, label: str) -> Optional[int]:
+        """Row id for a dropdown label, falling back to the first row with that name."""
+        if label in self._by_label:
+            return self._by_label[label]
+        ids = self._by_name.get(normalize_key(label))
+        return ids[0] if ids else None
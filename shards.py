@@ -0,0 +1,194 @@
+"""Splitting one batch across several machines and merging the results.
+
+Rows are numbered in file order, and row r belongs to shard r % count.
+Every node reads the same data file, so every node agrees on the split
+without talking to the others. Each node renders its rows with the normal
+pipeline into files named <row>__<name>.docx, and writes
+shard-<index>-of-<count>.json listing what happened to each of its rows:
+
+    {"kind": "letters", "shard": 0, "shards": 4, "data": "roster.xlsx",
+     "data_sha256": "...", "rows_in_data": 1200,
+     "rows": [{"row": 0, "status": "ok", "file": "0000000__Letter_Ali.docx", "name": "Letter_Ali"},
+              {"row": 4, "status": "skipped", "error": "Missing student name."}, ...]}
+
+`merge_shards` checks the manifests belong together. It needs one per
+shard, the same data file, and every row exactly once. Then it renames
+the files back in row order, so duplicate names get the same _2, _3
+suffixes a single-node run would give, and packages them as usual.
+"""
+
+import json, os, re, shutil, tempfile, zipfile
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from archive import package
+from letters import Job, unique_path
+
+MANIFEST = re.compile(r"^shard-(\d+)-of-(\d+)\.json$")
+_ROW_WIDTH = 7
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """'2/8' -> (2, 8). Shards are numbered from 0, like Kubernetes job indexes."""
+    try:
+        index, count = (int(x) for x in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"Shard must look like INDEX/COUNT, e.g. 0/4 (got '{spec}')") from None
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Shard index must be between 0 and {count - 1} (got {index})")
+    return index, count
+
+class _NeverTaken(set):
+    """A `taken` set that is always empty, so job names come out un-suffixed; shards dedupe at merge."""
+
+    def __contains__(self, item) -> bool:
+        return False
+
+    def add(self, item) -> None:
+        pass
+
+class ShardRun:
+    """Feeds one shard's rows to a job generator and records which row each job came from."""
+
+    def __init__(self, records: Iterable[Dict], index: int, count: int):
+        self.records = records
+        self.index, self.count = index, count
+        self.skipped: List[str] = []  # why rows got no job; kept apart from render errors so each row gets its own
+        self.rows_in_data = 0
+        self._pulled: List[Tuple[int, int]] = []  # (row, len(skipped) when it was pulled)
+        self._jobs: Dict[int, str] = {}  # row -> name without extension
+
+    def rows(self) -> Iterator[Dict]:
+        for row, record in enumerate(self.records):
+            self.rows_in_data = row + 1
+            if row % self.count == self.index:
+                self._pulled.append((row, len(self.skipped)))
+                yield record
+
+    def jobs(self, make_jobs: Callable[[Iterable[Dict], set, List[str]], Iterable[Job]]) -> Iterator[Job]:
+        """`make_jobs(rows, taken, skipped)` is letter_jobs/viva_jobs with everything else bound.
+
+        Lazy like the generators it wraps, so renderers still pull bounded windows.
+        """
+        for tpl_path, fields, out_path in make_jobs(self.rows(), _NeverTaken(), self.skipped):
+            row = self._pulled[-1][0]
+            name, ext = os.path.splitext(os.path.basename(out_path))
+            self._jobs[row] = name
+            yield tpl_path, fields, os.path.join(os.path.dirname(out_path), f"{row:0{_ROW_WIDTH}d}__{name}{ext}")
+
+    def manifest(self, kind: str, data_path: str, data_sha256: str, files: List[str]) -> Dict:
+        produced = {os.path.splitext(os.path.basename(f))[0]: os.path.basename(f) for f in files}
+        rows = []
+        for i, (row, err_start) in enumerate(self._pulled):
+            err_end = self._pulled[i + 1][1] if i + 1 < len(self._pulled) else len(self.skipped)
+            if row not in self._jobs:
+                rows.append({"row": row, "status": "skipped", "error": "; ".join(self.skipped[err_start:err_end])})
+                continue
+            name = self._jobs[row]
+            file = produced.get(f"{row:0{_ROW_WIDTH}d}__{name}")
+            rows.append({"row": row, "status": "ok", "file": file, "name": name} if file else {"row": row, "status": "failed", "name": name})
+        return {
+            "kind": kind, "shard": self.index, "shards": self.count,
+            "data": os.path.basename(data_path), "data_sha256": data_sha256,
+            "rows_in_data": self.rows_in_data, "rows": rows,
+        }
+
+def write_manifest(manifest: Dict, out_dir: str) -> str:
+    path = os.path.join(out_dir, f"shard-{manifest['shard']}-of-{manifest['shards']}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    return path
+
+# -------------------------
+# Merging
+# -------------------------
+def _open_shard(path: str, scratch: str) -> Tuple[Dict, str]:
+    """Return (manifest, folder holding the shard's files). ZIPs are extracted into `scratch`."""
+    if zipfile.is_zipfile(path):
+        folder = tempfile.mkdtemp(dir=scratch)
+        with zipfile.ZipFile(path) as z:
+            z.extractall(folder)
+    else:
+        folder = path
+    manifests = [n for n in os.listdir(folder) if MANIFEST.match(n)]
+    if len(manifests) != 1:
+        raise ValueError(f"{path}: expected one shard-*-of-*.json manifest, found {len(manifests)}")
+    with open(os.path.join(folder, manifests[0]), encoding="utf-8") as f:
+        return json.load(f), folder
+
+def check_shards(manifests: List[Dict]) -> Tuple[List[str], List[str]]:
+    """Consistency of a set of shard manifests. Returns (errors, warnings)."""
+    errors, warnings = [], []
+    if not manifests:
+        return ["No shards given."], []
+    first = manifests[0]
+    for key in ("kind", "shards", "data_sha256", "rows_in_data"):
+        values = {m[key] for m in manifests}
+        if len(values) > 1:
+            errors.append(f"Shards disagree on {key}: {', '.join(map(str, sorted(values, key=str)))}")
+    indexes = [m["shard"] for m in manifests]
+    missing_shards = sorted(set(range(first["shards"])) - set(indexes))
+    duplicate_shards = sorted({i for i in indexes if indexes.count(i) > 1})
+    if missing_shards:
+        errors.append(f"Missing shard(s) {', '.join(map(str, missing_shards))} of {first['shards']}.")
+    if duplicate_shards:
+        errors.append(f"Shard(s) {', '.join(map(str, duplicate_shards))} given more than once.")
+
+    seen: Dict[int, int] = {}
+    for m in manifests:
+        for r in m["rows"]:
+            seen[r["row"]] = seen.get(r["row"], 0) + 1
+    missing_rows = sorted(set(range(first["rows_in_data"])) - set(seen))
+    duplicate_rows = sorted(r for r, n in seen.items() if n > 1)
+    if missing_rows:
+        errors.append(f"{len(missing_rows)} rows missing from every shard (first: {', '.join(str(r + 1) for r in missing_rows[:8])}).")
+    if duplicate_rows and not duplicate_shards:
+        errors.append(f"{len(duplicate_rows)} rows rendered by more than one shard (first: {', '.join(str(r + 1) for r in duplicate_rows[:8])}).")
+
+    skipped = [r for m in manifests for r in m["rows"] if r["status"] != "ok"]
+    for r in sorted(skipped, key=lambda r: r["row"])[:8]:
+        warnings.append(f"Row {r['row'] + 1} {r['status']}" + (f": {r['error']}" if r.get("error") else ""))
+    if len(skipped) > 8:
+        warnings.append(f"... and {len(skipped) - 8} more rows without a letter.")
+    return errors, warnings
+
+def merge_shards(
+    inputs: List[str],
+    out: str,
+    archive: str = "stored",
+    level: Optional[int] = None,
+    volume_mb: float = 0,
+    force: bool = False,
+) -> Tuple[List[str], List[str], List[str]]:
+    """Combine shard outputs (folders or ZIPs) into `out` (.zip or folder), in row order.
+
+    Returns (written files, errors, warnings). Nothing is written if the
+    shards are inconsistent, unless `force` is set.
+    """
+    scratch = tempfile.mkdtemp(prefix="shards_")
+    try:
+        opened = [_open_shard(p, scratch) for p in inputs]
+        errors, warnings = check_shards([m for m, _ in opened])
+        if errors and not force:
+            return [], errors, warnings
+
+        staged = os.path.join(scratch, "merged")
+        os.makedirs(staged)
+        entries = sorted(
+            ((r["row"], r, folder) for m, folder in opened for r in m["rows"] if r["status"] == "ok"),
+            key=lambda e: e[0],
+        )
+        taken: set = set()
+        files = []
+        for _, r, folder in entries:
+            ext = os.path.splitext(r["file"])[1]
+            dest = unique_path(staged, r["name"], taken, ext)
+            shutil.copy2(os.path.join(folder, r["file"]), dest)
+            files.append(dest)
+
+        if out.lower().endswith(".zip"):
+            os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+            written = package(files, out, archive, level, int(volume_mb * 1024 * 1024)) if files else []
+        else:
+            written = package(files, "", "folder", out_dir=out)
+        return written, errors, warnings
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
@@ -0,0 +1,183 @@
+"""Local, precompiled copies of the templates listed in the `templates` table.
+
+Every template is kept at one stable path (<root>/<filename>), so
+letters.compile_template's cache hits across requests instead of every
+request downloading and parsing its own copy.
+
+At startup a background thread downloads and compiles the most recently
+uploaded templates. It then polls the table every TEMPLATE_POLL seconds.
+Each row's version is its `content_hash`, or `uploaded_at` if the table has
+no hash column. Only templates whose version changed are downloaded again,
+and deleted ones are dropped. With polling off, `path` checks the version
+itself before each use.
+
+A refresh replaces the shared copy in place, so batches render from
+`snapshot`, a hard link to the version current when the batch started.
+"""
+
+import os, shutil, threading, time, uuid
+from typing import Dict, List, Optional, Tuple
+
+from letters import compile_template
+from uploads import missing_column
+
+TEMPLATE_WARMUP = int(os.getenv("LETTER_TEMPLATE_WARMUP", "50"))  # most recent templates to precompile (0 = off)
+TEMPLATE_POLL = int(os.getenv("LETTER_TEMPLATE_POLL", "60"))  # seconds between change checks (0 = off)
+DOWNLOAD_TIMEOUT = 60
+
+def _version(row: Dict) -> str:
+    return str(row.get("content_hash") or row.get("uploaded_at") or row.get("file_url") or "")
+
+class TemplateStore:
+    def __init__(self, client, root: str, poll_interval: int = TEMPLATE_POLL):
+        self.client = client
+        self.root = root
+        self.poll_interval = poll_interval
+        self._entries: Dict[str, Tuple[str, str]] = {}  # filename -> (version, local path)
+        self._lock = threading.Lock()
+        self._hash_column = True
+        self._thread = None
+        os.makedirs(root, exist_ok=True)
+
+    # --- Metadata ---
+    def _rows(self, filename: Optional[str] = None) -> List[Dict]:
+        columns = "filename, file_url, uploaded_at"
+        for cols in ([f"{columns}, content_hash"] if self._hash_column else []) + [columns]:
+            query = self.client.table("templates").select(cols)
+            if filename is not None:
+                query = query.eq("filename", filename)
+            try:
+                return query.execute().data
+            except Exception as e:
+                if "content_hash" not in cols or not missing_column(e, "content_hash"):
+                    raise
+                self._hash_column = False  # table predates content hashes; fall back to uploaded_at
+        return []
+
+    # --- Local copies ---
+    def _download(self, row: Dict) -> str:
+        import requests
+
+        filename = os.path.basename(row["filename"])
+        dest = os.path.join(self.root, filename)
+        tmp = f"{dest}.{uuid.uuid4().hex[:8]}.part"
+        # The version in the query string gets past CDN caches of the old file
+        with requests.get(row["file_url"], params={"v": _version(row)[:16]}, stream=True, timeout=DOWNLOAD_TIMEOUT) as r:
+            if r.status_code != 200:
+                raise RuntimeError(f"HTTP {r.status_code}")
+            with open(tmp, "wb") as f:
+                for chunk in r.iter_content(chunk_size=1 << 16):
+                    f.write(chunk)
+        os.replace(tmp, dest)  # renders already reading the old copy keep their file
+        compile_template(dest)
+        with self._lock:
+            self._entries[row["filename"]] = (_version(row), dest)
+        return dest
+
+    def path(self, filename: str) -> Optional[str]:
+        """Local path of an up-to-date copy of `filename`, downloading it if needed."""
+        with self._lock:
+            cached = self._entries.get(filename)
+        if cached and os.path.exists(cached[1]) and self._thread is not None and self.poll_interval:
+            return cached[1]  # the poller keeps it current
+        rows = self._rows(filename)
+        if not rows:
+            print(f"⚠️ Template not found in database table: {filename}")
+            self.forget(filename)
+            return None
+        if cached and cached[0] == _version(rows[0]) and os.path.exists(cached[1]):
+            return cached[1]
+        return self._download(rows[0])
+
+    def snapshot(self, filename: str, dest_dir: str) -> Optional[str]:
+        """A private copy of `filename` in `dest_dir` that later refreshes won't touch (for one batch)."""
+        path = self.path(filename)
+        if not path:
+            return None
+        folder = os.path.join(dest_dir, ".templates")  # apart from the letters, so names can't collide
+        os.makedirs(folder, exist_ok=True)
+        dest = os.path.join(folder, os.path.basename(filename))
+        try:
+            os.link(path, dest)  # os.replace swaps in a new inode; this one keeps the old content
+        except OSError:
+            shutil.copy2(path, dest)
+        return dest
+
+    def put(self, filename: str, src_path: str) -> None:
+        """Adopt a file just uploaded from this instance instead of downloading it back."""
+        rows = self._rows(filename)
+        dest = os.path.join(self.root, os.path.basename(filename))
+        tmp = f"{dest}.{uuid.uuid4().hex[:8]}.part"
+        with open(src_path, "rb") as src, open(tmp, "wb") as out:
+            for chunk in iter(lambda: src.read(1 << 20), b""):
+                out.write(chunk)
+        os.replace(tmp, dest)
+        compile_template(dest)
+        with self._lock:
+            self._entries[filename] = (_version(rows[0]) if rows else "", dest)
+
+    def forget(self, filename: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(filename, None)
+        if entry:
+            try:
+                os.remove(entry[1])
+            except OSError:
+                pass
+
+    # --- Background work ---
+    def warm_up(self, limit: int = TEMPLATE_WARMUP) -> int:
+        """Download and compile the `limit` most recently uploaded templates. Returns how many."""
+        rows = sorted(self._rows(), key=lambda r: str(r.get("uploaded_at") or ""), reverse=True)[:limit]
+        done = 0
+        for row in rows:
+            try:
+                self._download(row)
+                done += 1
+            except Exception as e:
+                print(f"⚠️ Could not warm up template {row.get('filename')}:", e)
+        return done
+
+    def refresh(self) -> Tuple[int, int]:
+        """Re-download cached templates whose version changed; drop deleted ones. Returns (updated, removed)."""
+        current = {r["filename"]: r for r in self._rows()}
+        with self._lock:
+            cached = dict(self._entries)
+        updated = removed = 0
+        for filename, (version, _) in cached.items():
+            row = current.get(filename)
+            if row is None:
+                self.forget(filename)
+                removed += 1
+            elif _version(row) != version:
+                try:
+                    self._download(row)
+                    updated += 1
+                except Exception as e:
+                    print(f"⚠️ Could not refresh template {filename}:", e)
+        return updated, removed
+
+    def start(self, warmup: int = TEMPLATE_WARMUP) -> None:
+        """Warm up, then poll for changes, in a daemon thread (once per process)."""
+        if self._thread is not None or (not warmup and not self.poll_interval):
+            return
+
+        def loop():
+            started = time.time()
+            try:
+                if warmup:
+                    n = self.warm_up(warmup)
+                    print(f"🔥 Warmed up {n} templates in {time.time() - started:.1f}s")
+            except Exception as e:
+                print("⚠️ Template warm-up error:", e)
+            while self.poll_interval:
+                time.sleep(self.poll_interval)
+                try:
+                    updated, removed = self.refresh()
+                    if updated or removed:
+                        print(f"🔄 Templates: {updated} updated, {removed} removed")
+                except Exception as e:
+                    print("⚠️ Template poll error:", e)
+
+        self._thread = threading.Thread(target=loop, name="template-store", daemon=True)
+        self._thread.start()
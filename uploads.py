@@ -0,0 +1,131 @@
+"""Uploading templates and data files to storage without redundant transfers.
+
+Each file is hashed while it is streamed from disk (SHA-256, 1 MB reads). If
+the metadata row already holds the same `content_hash`, the upload is
+skipped and nothing is written. Otherwise the file goes up as a stream, or
+in 6 MB resumable (TUS) chunks once it is over LARGE_FILE_MB. Only that
+file's row is then updated, or inserted if it is new.
+
+Tables without a `content_hash` column still work; they just never skip.
+"""
+
+import base64, hashlib, mimetypes, os
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+from urllib.parse import urljoin
+
+HASH_CHUNK = 1024 * 1024
+TUS_CHUNK = 6 * 1024 * 1024  # Supabase's resumable endpoint requires 6 MB chunks
+LARGE_FILE_MB = int(os.getenv("LETTER_LARGE_FILE_MB", "20"))
+UPLOAD_TIMEOUT = 120
+
+def file_sha256(path: str, chunk_size: int = HASH_CHUNK) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def missing_column(error: Exception, column: str) -> bool:
+    """True if `error` is PostgREST saying `column` doesn't exist (Postgres 42703 / PGRST204)."""
+    code = str(getattr(error, "code", "") or "")
+    text = str(error)
+    return column in text and (code in ("42703", "PGRST204") or "42703" in text or "does not exist" in text)
+
+def _content_type(path: str) -> str:
+    return mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+class Uploader:
+    """Hash-deduplicating uploads through a Supabase client (or localstore.LocalSupabase).
+
+    `url`/`key` enable resumable chunked uploads for large files; without
+    them every file is streamed through the client.
+    """
+
+    def __init__(self, client, url: Optional[str] = None, key: Optional[str] = None, large_file_bytes: int = LARGE_FILE_MB * 1024 * 1024):
+        self.client = client
+        self.url = url.rstrip("/") if url else None
+        self.key = key
+        self.large_file_bytes = large_file_bytes
+        self._hash_columns: Dict[str, bool] = {}
+
+    # --- Metadata ---
+    def stored_row(self, table: str, filename: str) -> Optional[Dict]:
+        """The file's metadata row, or None. Notes whether the table has `content_hash`."""
+        if self._hash_columns.get(table, True):
+            try:
+                res = self.client.table(table).select("filename, file_url, content_hash").eq("filename", filename).execute()
+                self._hash_columns[table] = True
+                return res.data[0] if res.data else None
+            except Exception as e:
+                if not missing_column(e, "content_hash"):
+                    raise  # a network or server error, not an old schema
+                print(f"⚠️ Table '{table}' has no content_hash column, uploads won't be deduplicated:", e)
+                self._hash_columns[table] = False
+        res = self.client.table(table).select("filename, file_url").eq("filename", filename).execute()
+        return res.data[0] if res.data else None
+
+    # --- Transfer ---
+    def _stream(self, bucket: str, object_name: str, path: str) -> None:
+        with open(path, "rb") as f:
+            self.client.storage.from_(bucket).upload(
+                object_name, f, {"upsert": "true", "content-type": _content_type(path)}
+            )
+
+    def _resumable(self, bucket: str, object_name: str, path: str, size: int) -> None:
+        import requests
+
+        headers = {"authorization": f"Bearer {self.key}", "apikey": self.key, "tus-resumable": "1.0.0", "x-upsert": "true"}
+        meta = {"bucketName": bucket, "objectName": object_name, "contentType": _content_type(path), "cacheControl": "3600"}
+        endpoint = f"{self.url}/storage/v1/upload/resumable"
+        r = requests.post(endpoint, timeout=UPLOAD_TIMEOUT, headers={
+            **headers,
+            "upload-length": str(size),
+            "upload-metadata": ",".join(f"{k} {base64.b64encode(v.encode()).decode()}" for k, v in meta.items()),
+        })
+        r.raise_for_status()
+        location = urljoin(endpoint, r.headers["location"])
+
+        offset = 0
+        with open(path, "rb") as f:
+            while offset < size:
+                f.seek(offset)
+                chunk = f.read(TUS_CHUNK)
+                r = requests.patch(location, data=chunk, timeout=UPLOAD_TIMEOUT, headers={
+                    **headers,
+                    "upload-offset": str(offset),
+                    "content-type": "application/offset+octet-stream",
+                })
+                r.raise_for_status()
+                offset = int(r.headers.get("upload-offset", offset + len(chunk)))
+
+    def upload(self, bucket: str, object_name: str, path: str, table: str, filename: Optional[str] = None) -> Tuple[bool, Dict]:
+        """Upload `path` unless storage already has identical content.
+
+        Returns (uploaded, row): uploaded is False when the transfer was
+        skipped; row is the file's metadata row either way.
+        """
+        filename = filename or os.path.basename(path)
+        digest = file_sha256(path)
+        row = self.stored_row(table, filename)
+        if row and row.get("content_hash") == digest:
+            return False, row
+
+        size = os.path.getsize(path)
+        if self.url and self.key and size > self.large_file_bytes:
+            self._resumable(bucket, object_name, path, size)
+        else:
+            self._stream(bucket, object_name, path)
+
+        # uploaded_at changes on every upload, so other instances notice even without content_hash
+        fields = {
+            "file_url": self.client.storage.from_(bucket).get_public_url(object_name),
+            "uploaded_at": datetime.now(timezone.utc).isoformat(),
+        }
+        if self._hash_columns.get(table):
+            fields["content_hash"] = digest
+        if row:
+            self.client.table(table).update(fields).eq("filename", filename).execute()
+        else:
+            self.client.table(table).insert({"filename": filename, **fields}).execute()
+        return True, {"filename": filename, **fields}
@@ -0,0 +1,152 @@
+"""Managed scratch space for generated letters and downloaded files.
+
+Everything the app writes to disk goes under one root:
+
+    <root>/jobs/<prefix>_<time>_<id>/   one folder per generation job
+    <root>/downloads/<id><ext>          data files fetched from storage
+    <root>/cache/templates/<filename>   warm template copies (templatestore.py, never reaped)
+
+A background reaper deletes entries older than the TTL and, if the total
+still exceeds the size cap, the oldest finished jobs. Jobs that are still
+running are never touched.
+"""
+
+import os, shutil, tempfile, threading, time, uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, Set
+
+WORKSPACE_ROOT = os.getenv("LETTER_WORKSPACE") or os.path.join(tempfile.gettempdir(), "letter_workspace")
+WORKSPACE_TTL = int(os.getenv("LETTER_WORKSPACE_TTL", "3600"))  # seconds to keep finished output
+WORKSPACE_MAX_MB = int(os.getenv("LETTER_WORKSPACE_MAX_MB", "2048"))
+REAP_INTERVAL = int(os.getenv("LETTER_REAP_INTERVAL", "300"))
+
+def _size(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for f in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, f))
+            except OSError:
+                pass
+    return total
+
+def _remove(path: str) -> None:
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+class Workspace:
+    def __init__(self, root: str = WORKSPACE_ROOT, ttl: int = WORKSPACE_TTL, max_bytes: int = WORKSPACE_MAX_MB * 1024 * 1024):
+        self.root = root
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._active: Set[str] = set()
+        self._lock = threading.Lock()
+        self._reaper = None
+        for sub in ("jobs", "downloads"):
+            os.makedirs(os.path.join(root, sub), exist_ok=True)
+
+    # --- Allocation ---
+    @contextmanager
+    def job(self, prefix: str = "job") -> Iterator[str]:
+        """A fresh folder for one generation job, protected from reaping until the block exits.
+
+        Files left in it (e.g. the ZIP handed to the user) stay until the TTL expires.
+        """
+        path = os.path.join(self.root, "jobs", f"{prefix}_{time.strftime('%Y%m%d-%H%M%S')}_{uuid.uuid4().hex[:6]}")
+        os.makedirs(path)
+        with self._lock:
+            self._active.add(path)
+        try:
+            yield path
+        finally:
+            with self._lock:
+                self._active.discard(path)
+            os.utime(path)  # TTL counts from when the job finished
+
+    def download_path(self, ext: str = "") -> str:
+        return os.path.join(self.root, "downloads", f"{uuid.uuid4().hex}{ext}")
+
+    # --- Reaping ---
+    def _entries(self):
+        for sub in ("jobs", "downloads"):
+            base = os.path.join(self.root, sub)
+            try:
+                names = os.listdir(base)
+            except FileNotFoundError:
+                continue
+            for name in names:
+                path = os.path.join(base, name)
+                try:
+                    yield sub, path, os.path.getmtime(path)
+                except OSError:
+                    pass
+
+    def reap(self) -> int:
+        """Delete expired entries, then the oldest finished jobs while over the size cap. Returns how many were removed."""
+        now = time.time()
+        with self._lock:
+            active = set(self._active)
+        removed = 0
+        kept = []
+        for sub, path, mtime in self._entries():
+            if path in active:
+                continue
+            if now - mtime > self.ttl:
+                _remove(path)
+                removed += 1
+            elif sub == "jobs":
+                kept.append((mtime, path))
+
+        if self.max_bytes:
+            total = self.disk_usage()
+            for _, path in sorted(kept):
+                if total <= self.max_bytes:
+                    break
+                size = _size(path)
+                _remove(path)
+                total -= size
+                removed += 1
+        return removed
+
+    def start_reaper(self, interval: int = REAP_INTERVAL) -> None:
+        """Run `reap` every `interval` seconds in a daemon thread (once per process)."""
+        if self._reaper is not None:
+            return
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    removed = self.reap()
+                    if removed:
+                        print(f"🧹 Workspace: removed {removed} old entries, {self.stats()['mb']} MB in use")
+                except Exception as e:
+                    print("⚠️ Workspace reaper error:", e)
+
+        self._reaper = threading.Thread(target=loop, name="workspace-reaper", daemon=True)
+        self._reaper.start()
+
+    # --- Metrics ---
+    def disk_usage(self) -> int:
+        return _size(self.root)
+
+    def stats(self) -> Dict[str, float]:
+        counts = {"jobs": 0, "downloads": 0}
+        for sub, _, _ in self._entries():
+            counts[sub] += 1
+        try:
+            cached = [n for n in os.listdir(os.path.join(self.root, "cache", "templates")) if not n.endswith(".part")]
+        except FileNotFoundError:
+            cached = []
+        counts["templates"] = len(cached)
+        used = self.disk_usage()
+        with self._lock:
+            running = len(self._active)
+        return {"bytes": used, "mb": round(used / (1024 * 1024), 1), "running_jobs": running, **counts}